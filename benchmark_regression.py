@@ -0,0 +1,321 @@
+import argparse
+import csv
+import io
+import json
+import math
+import re
+import shutil
+import subprocess
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+import yaml
+
+# --- REGRESSION BENCHMARK ---
+# Runs the pipeline stage by stage on the bundled dataset and on synthetic
+# datasets scaled from it, and compares the results with golden outputs:
+# every processed and presentation table must match row for row and in its
+# per-column aggregates, and every stage must stay within its time and
+# peak-memory thresholds. Record the goldens before changing internals (e.g.
+# trying another join engine), then check the change against them.
+# Usage:
+#   python benchmark_regression.py --update-golden        # on the known-good tree
+#   python benchmark_regression.py                        # after the change
+#   python benchmark_regression.py --set data_modelling.join_engine=pandas
+PROJECT_ROOT = Path(__file__).resolve().parent
+STAGES = ["ingestion", "validation", "transformation", "modelling"]
+
+# Tables replicated in the scaled datasets, with their order ids shifted per
+# copy; the dimension tables are kept as they are, so every copy still joins.
+SCALED_TABLES = ["SalesOrders", "SalesOrderItems"]
+SCALED_KEY = "SALESORDERID"
+
+# Peak RSS of a whole stage, as logged by main.py. A child's ru_maxrss is not
+# used: on Linux it starts from the parent's peak at fork.
+STAGE_PEAK_PATTERN = re.compile(r"Memory \[[^\]]* stage\]: peak RSS ([\d,]+) MB")
+
+
+def read_csv_rows(data: bytes) -> tuple:
+    """
+    Decodes a raw CSV file like DataTransformation does (UTF-8 with a byte
+    order mark, otherwise latin1) and returns (encoding, header, rows).
+    """
+    encoding = "utf-8-sig" if data.startswith(b"\xef\xbb\xbf") else "latin1"
+    rows = list(csv.reader(io.StringIO(data.decode(encoding), newline="")))
+    return encoding, rows[0], rows[1:]
+
+
+def build_dataset(source_zip: Path, scale: int, path: Path):
+    """
+    Writes a copy of the source zip whose sales tables hold 'scale' copies of
+    every order. Copy k adds k * stride to the numeric order ids, keeping
+    their width, where the stride exceeds the range of the original ids.
+    """
+    with zipfile.ZipFile(source_zip) as src:
+        files = {name: src.read(name) for name in src.namelist()}
+
+    scaled = {name: read_csv_rows(data) for name, data in files.items() if Path(name).stem in SCALED_TABLES}
+    ids = [int(row[header.index(SCALED_KEY)]) for _, header, rows in scaled.values() for row in rows]
+    stride = 10 ** len(str(max(ids) - min(ids) + 1))
+
+    for name, (encoding, header, rows) in scaled.items():
+        key = header.index(SCALED_KEY)
+        out = io.StringIO(newline="")
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(header)
+        for copy in range(scale):
+            for row in rows:
+                row = list(row)
+                row[key] = str(int(row[key]) + copy * stride).zfill(len(row[key]))
+                writer.writerow(row)
+        files[name] = out.getvalue().encode(encoding)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as dst:
+        for name, data in files.items():
+            dst.writestr(name, data)
+
+
+def prepare_workspace(workspace: Path, dataset_zip: Path, overrides: list) -> dict:
+    """
+    Creates a clean workspace with the project's config.yaml and schema.yaml,
+    pointed at the dataset zip and with the --set overrides applied. The
+    pipeline runs with the workspace as working directory, so every relative
+    path in the config (artifacts, data, logs) stays inside it.
+    """
+    shutil.rmtree(workspace, ignore_errors=True)
+    workspace.mkdir(parents=True)
+    shutil.copy(PROJECT_ROOT / "schema.yaml", workspace / "schema.yaml")
+
+    config = yaml.safe_load((PROJECT_ROOT / "config.yaml").read_text())
+    config["data_ingestion"]["source_zip_file"] = str(dataset_zip.resolve())
+    for override in overrides:
+        key, _, value = override.partition("=")
+        *sections, name = key.split(".")
+        target = config
+        for section in sections:
+            target = target.setdefault(section, {})
+        target[name] = yaml.safe_load(value)
+    (workspace / "config.yaml").write_text(yaml.safe_dump(config, sort_keys=False))
+    return config
+
+
+def run_stage(workspace: Path, stage: str) -> tuple:
+    """
+    Runs one pipeline stage in a fresh interpreter.
+
+    Returns:
+        tuple: (wall seconds, peak RSS in MB of the stage, or None where the
+        platform cannot report it).
+    """
+    log_path = workspace / f"{stage}.log"
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        process = subprocess.run(
+            [sys.executable, str(PROJECT_ROOT / "main.py"), "--stages", stage],
+            cwd=workspace, stdout=log, stderr=subprocess.STDOUT
+        )
+    seconds = time.perf_counter() - start
+
+    output = log_path.read_text()
+    if process.returncode != 0:
+        tail = "".join(output.splitlines(keepends=True)[-20:])
+        raise RuntimeError(f"Stage {stage} failed with exit code {process.returncode}:\n{tail}")
+    peaks = STAGE_PEAK_PATTERN.findall(output)
+    return seconds, float(peaks[-1].replace(",", "")) if peaks else None
+
+
+def collect_outputs(workspace: Path, config: dict) -> dict:
+    """
+    Reads every processed table and every table of the published presentation snapshot.
+    """
+    processed = workspace / config["data_transformation"]["output_path"]
+    presentation = workspace / config["data_modelling"]["presentation_path"]
+    snapshot = presentation / "versions" / (presentation / "CURRENT").read_text().strip()
+
+    tables = {}
+    for layer, directory in (("processed", processed), ("presentation", snapshot)):
+        for path in sorted(directory.glob("*.parquet")):
+            tables[f"{layer}/{path.stem}"] = pd.read_parquet(path)
+    return tables
+
+
+def canonical(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns a table in a form that does not depend on row or column order or
+    on the storage types: columns by name, categoricals as plain values, rows
+    sorted by their non-float columns and then their float columns.
+    """
+    df = df[sorted(df.columns)].copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(df[col].cat.categories.dtype)
+    floats = [col for col in df.columns if pd.api.types.is_float_dtype(df[col])]
+    others = [col for col in df.columns if col not in floats]
+    keys = pd.DataFrame({col: df[col].astype("string") for col in others}, index=df.index).join(df[floats])
+    order = keys.sort_values(others + floats, na_position="last", kind="stable").index
+    return df.loc[order].reset_index(drop=True)
+
+
+def json_value(value):
+    """
+    Converts an aggregate to a JSON value; missing values become None.
+    """
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if hasattr(value, "item") else value
+
+
+def table_aggregates(df: pd.DataFrame) -> dict:
+    """
+    Returns the row count and, per column, the null and distinct counts and
+    the sum, min and max of numeric columns (min and max of datetimes).
+    """
+    columns = {}
+    for col in sorted(df.columns):
+        values = df[col]
+        stats = {"nulls": int(values.isna().sum()), "distinct": int(values.nunique(dropna=True))}
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            stats.update(sum=json_value(values.sum()), min=json_value(values.min()), max=json_value(values.max()))
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            stats.update(min=json_value(values.min()), max=json_value(values.max()))
+        columns[col] = stats
+    return {"rows": len(df), "columns": columns}
+
+
+def compare_aggregates(golden: dict, current: dict, rtol: float) -> list:
+    """
+    Returns a description of every aggregate that differs from the golden one.
+    """
+    if golden["rows"] != current["rows"]:
+        return [f"{golden['rows']} rows expected, got {current['rows']}"]
+    missing = sorted(set(golden["columns"]) - set(current["columns"]))
+    extra = sorted(set(current["columns"]) - set(golden["columns"]))
+    differences = [f"missing columns {missing}"] if missing else []
+    differences += [f"unexpected columns {extra}"] if extra else []
+
+    for col in sorted(set(golden["columns"]) & set(current["columns"])):
+        for stat, expected in golden["columns"][col].items():
+            actual = current["columns"][col].get(stat)
+            if isinstance(expected, float) and isinstance(actual, (int, float)):
+                equal = math.isclose(expected, actual, rel_tol=rtol, abs_tol=1e-9)
+            else:
+                equal = expected == actual
+            if not equal:
+                differences.append(f"{col}.{stat}: expected {expected}, got {actual}")
+    return differences
+
+
+def compare_rows(golden: pd.DataFrame, current: pd.DataFrame, rtol: float) -> str:
+    """
+    Compares two canonical tables row by row, with a relative tolerance on
+    floats. Returns a description of the first difference, or None.
+    """
+    if sorted(golden.columns) != sorted(current.columns) or len(golden) != len(current):
+        return f"shape {golden.shape} expected, got {current.shape}"
+    try:
+        pd.testing.assert_frame_equal(
+            golden, current[golden.columns], check_dtype=False, check_exact=False, rtol=rtol, atol=1e-9
+        )
+    except AssertionError as e:
+        return " ".join(str(e).split())[:300]
+    return None
+
+
+def over_threshold(golden: float, current: float, tolerance: float, slack: float) -> bool:
+    """
+    Whether a measurement regressed beyond the relative tolerance plus an
+    absolute slack, which keeps tiny stages from failing on noise.
+    """
+    if golden is None or current is None:
+        return False
+    return current > golden * (1 + tolerance) + slack
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check pipeline outputs and performance against golden runs.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10],
+                        help="Dataset sizes as multiples of the bundled data; 1 is the bundled zip itself.")
+    parser.add_argument("--update-golden", action="store_true", help="Record the outputs and measurements as the new goldens.")
+    parser.add_argument("--golden-dir", type=Path, default=PROJECT_ROOT / "artifacts/regression/golden")
+    parser.add_argument("--work-dir", type=Path, default=PROJECT_ROOT / "artifacts/regression/work")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="Override a config.yaml value for the runs (repeatable).")
+    parser.add_argument("--repeat", type=int, default=1, help="Pipeline runs per dataset; the best time and memory are kept.")
+    parser.add_argument("--rtol", type=float, default=1e-9, help="Relative tolerance for float values and aggregates.")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="Allowed relative slowdown per stage.")
+    parser.add_argument("--time-slack", type=float, default=0.5, help="Allowed absolute slowdown per stage, in seconds.")
+    parser.add_argument("--memory-tolerance", type=float, default=0.20, help="Allowed relative peak-memory growth per stage.")
+    parser.add_argument("--memory-slack", type=float, default=32, help="Allowed absolute peak-memory growth per stage, in MB.")
+    args = parser.parse_args()
+
+    failures = []
+    for scale in args.scales:
+        dataset = f"scale_{scale}"
+        golden_dir = args.golden_dir / dataset
+        workspace = args.work_dir / dataset
+        dataset_zip = PROJECT_ROOT / "BI Test.zip"
+        if scale > 1:
+            dataset_zip = args.work_dir / "datasets" / f"{dataset}.zip"
+            build_dataset(PROJECT_ROOT / "BI Test.zip", scale, dataset_zip)
+
+        stages = {}
+        for _ in range(args.repeat):
+            config = prepare_workspace(workspace, dataset_zip, args.overrides)
+            for stage in STAGES:
+                seconds, peak_mb = run_stage(workspace, stage)
+                best = stages.setdefault(stage, {"seconds": seconds, "peak_rss_mb": peak_mb})
+                best["seconds"] = min(best["seconds"], seconds)
+                if peak_mb is not None:
+                    best["peak_rss_mb"] = min(best["peak_rss_mb"] or peak_mb, peak_mb)
+        tables = {name: canonical(df) for name, df in collect_outputs(workspace, config).items()}
+        aggregates = {name: table_aggregates(df) for name, df in tables.items()}
+
+        if args.update_golden:
+            shutil.rmtree(golden_dir, ignore_errors=True)
+            for name, df in tables.items():
+                path = golden_dir / "tables" / f"{name}.parquet"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                df.to_parquet(path, index=False)
+            (golden_dir / "metrics.json").write_text(json.dumps({"stages": stages, "tables": aggregates}, indent=2))
+            print(f"Recorded golden outputs for {dataset} ({len(tables)} tables) in {golden_dir}")
+            continue
+
+        if not (golden_dir / "metrics.json").exists():
+            failures.append(f"{dataset}: no golden outputs in {golden_dir}; run with --update-golden first")
+            continue
+        golden = json.loads((golden_dir / "metrics.json").read_text())
+
+        print(f"\n{dataset}")
+        print(f"{'stage':<16}{'golden s':>10}{'now s':>10}{'golden MB':>12}{'now MB':>10}  status")
+        for stage in STAGES:
+            expected, actual = golden["stages"][stage], stages[stage]
+            slow = over_threshold(expected["seconds"], actual["seconds"], args.time_tolerance, args.time_slack)
+            heavy = over_threshold(expected["peak_rss_mb"], actual["peak_rss_mb"], args.memory_tolerance, args.memory_slack)
+            status = ", ".join(s for s, bad in (("slower", slow), ("more memory", heavy)) if bad) or "ok"
+            print(f"{stage:<16}{expected['seconds']:>10.2f}{actual['seconds']:>10.2f}"
+                  f"{expected['peak_rss_mb'] or 0:>12.0f}{actual['peak_rss_mb'] or 0:>10.0f}  {status}")
+            if slow:
+                failures.append(f"{dataset}: {stage} took {actual['seconds']:.2f}s (golden {expected['seconds']:.2f}s)")
+            if heavy:
+                failures.append(f"{dataset}: {stage} peaked at {actual['peak_rss_mb']:.0f} MB (golden {expected['peak_rss_mb']:.0f} MB)")
+
+        for name in sorted(set(golden["tables"]) | set(tables)):
+            if name not in tables or name not in golden["tables"]:
+                failures.append(f"{dataset}: table {name} {'missing' if name not in tables else 'not in the goldens'}")
+                continue
+            for difference in compare_aggregates(golden["tables"][name], aggregates[name], args.rtol):
+                failures.append(f"{dataset}: {name} aggregate {difference}")
+            difference = compare_rows(pd.read_parquet(golden_dir / "tables" / f"{name}.parquet"), tables[name], args.rtol)
+            if difference:
+                failures.append(f"{dataset}: {name} rows differ: {difference}")
+
+    if failures:
+        print("\nRegression:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nOutputs and performance match the goldens." if not args.update_golden else "\nGoldens updated.")
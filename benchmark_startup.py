@@ -0,0 +1,84 @@
+import argparse
+import subprocess
+import sys
+import time
+
+# --- STARTUP BENCHMARK ---
+# Guards against import-time regressions: each probe runs in a fresh
+# interpreter and fails the benchmark if it exceeds its time budget.
+# Usage: python benchmark_startup.py [--repeat 5] [--budget 0.5]
+PROBES = {
+    "import configuration": "import src.config.configuration",
+    "import all stage modules": (
+        "import src.pipeline.stage_01_data_ingestion, src.pipeline.stage_02_data_validation, "
+        "src.pipeline.stage_03_data_transformation, src.pipeline.stage_04_data_modelling"
+    ),
+    "no-op pipeline run": "import runpy, sys; sys.argv = ['main.py', '--stages']; runpy.run_path('main.py')",
+    # A real run up to its first stage's "started" log line: configuration, coordination
+    # store, memory budget and pipeline lease. The stage itself is not run.
+    "single-stage start": (
+        "import logging, runpy, sys\n"
+        "from src.logger_config import logger\n"
+        "class StageStarted(BaseException): pass\n"
+        "class StopAtStart(logging.Handler):\n"
+        "    def emit(self, record):\n"
+        "        if 'started' in record.getMessage(): raise StageStarted()\n"
+        "logger.addHandler(StopAtStart())\n"
+        "sys.argv = ['main.py', '--stages', 'ingestion']\n"
+        "try:\n"
+        "    runpy.run_path('main.py')\n"
+        "except StageStarted:\n"
+        "    pass\n"
+        "else:\n"
+        "    sys.exit('the stage never logged that it started')"
+    ),
+}
+
+# Modules that must not be imported by the probes above
+HEAVY_MODULES = ["pandas", "pyarrow", "numpy", "duckdb"]
+
+
+def time_probe(code: str, repeat: int) -> float:
+    """
+    Returns the best wall time (in seconds) of running the code in a fresh interpreter.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def heavy_imports(code: str) -> list:
+    """
+    Returns the heavy modules that end up imported by the code.
+    """
+    # The result is marked, as the probe itself may log to stdout
+    check = f"{code}\nimport sys\nprint('heavy:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", check], check=True, capture_output=True, text=True).stdout
+    result = [line for line in output.splitlines() if line.startswith("heavy:")][-1]
+    return [m for m in result[len("heavy:"):].split(",") if m]
+
+
+parser = argparse.ArgumentParser(description="Benchmark pipeline startup time.")
+parser.add_argument("--repeat", type=int, default=5, help="Runs per probe; the best time is kept.")
+parser.add_argument("--budget", type=float, default=0.5, help="Maximum seconds allowed per probe.")
+args = parser.parse_args()
+
+baseline = time_probe("pass", args.repeat)
+failures = []
+print(f"{'probe':<28}{'seconds':>10}{'over bare python':>18}  heavy imports")
+for name, code in PROBES.items():
+    seconds = time_probe(code, args.repeat)
+    heavy = heavy_imports(code)
+    print(f"{name:<28}{seconds:>10.3f}{seconds - baseline:>18.3f}  {', '.join(heavy) or '-'}")
+    if seconds > args.budget:
+        failures.append(f"{name} took {seconds:.3f}s (budget {args.budget:.3f}s)")
+    if heavy:
+        failures.append(f"{name} imported {', '.join(heavy)}")
+
+if failures:
+    print("\nStartup regression:\n  " + "\n  ".join(failures))
+    sys.exit(1)
+print("\nStartup within budget.")
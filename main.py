@@ -1,50 +1,61 @@
-from src.pipeline.stage_01_data_ingestion import DataIngestionPipeline
-from src.pipeline.stage_02_data_validation import DataValidationPipeline
-from src.pipeline.stage_03_data_transformation import DataTransformationPipeline
-from src.pipeline.stage_04_data_modelling import DataModellingPipeline
+import argparse
+import importlib
 from src.logger_config import logger
 
-STAGE_NAME = "Data Ingestion stage"
-try:
-    logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<") 
-    data_ingestion = DataIngestionPipeline()
-    data_ingestion.main()
-    logger.info(f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
-except Exception as e:
-        logger.exception(e)
-        raise e
+# Each stage module is imported only when the stage runs, so single-stage
+# runs do not pay for the imports of the other stages.
+STAGES = {
+    "ingestion": ("Data Ingestion stage", "src.pipeline.stage_01_data_ingestion", "DataIngestionPipeline"),
+    "validation": ("Data Validation stage", "src.pipeline.stage_02_data_validation", "DataValidationPipeline"),
+    "transformation": ("Data Transformation stage", "src.pipeline.stage_03_data_transformation", "DataTransformationPipeline"),
+    "modelling": ("Data Modelling stage", "src.pipeline.stage_04_data_modelling", "DataModellingPipeline"),
+}
 
+# Stages that can be split into tasks and run by several workers
+DISTRIBUTED_STAGES = {"transformation": "run_transformation", "modelling": "run_modelling"}
 
-# --- STAGE 2: DATA VALIDATION ---
-STAGE_NAME = "Data Validation stage"
-try:
-    logger.info(f">>>>>> Stage {STAGE_NAME} started <<<<<<") 
-    data_validation = DataValidationPipeline()
-    data_validation.main()
-    logger.info(f">>>>>> Stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
-except Exception as e:
-    logger.exception(e)
-    raise e
+parser = argparse.ArgumentParser(description="Run the VeloAnalytics data pipeline.")
+parser.add_argument(
+    "--stages", nargs="*", choices=list(STAGES), default=list(STAGES),
+    help="Stages to run, in order (default: all). Pass no value for a no-op run."
+)
+parser.add_argument(
+    "--distributed", action="store_true",
+    help="Run transformation and modelling as queued tasks that other workers can pick up."
+)
+parser.add_argument(
+    "--worker", action="store_true",
+    help="Only work on queued tasks from other runs, then exit when idle."
+)
+args = parser.parse_args()
 
-# --- STAGE 3: DATA TRANSFORMATION ---
-STAGE_NAME = "Data Transformation stage"
-try:
-    logger.info(f">>>>>> Stage {STAGE_NAME} started <<<<<<") 
-    data_transformation = DataTransformationPipeline()
-    data_transformation.main()
-    logger.info(f">>>>>> Stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
-except Exception as e:
-    logger.exception(e)
-    raise e
+if args.worker:
+    from src.pipeline.work_queue import WorkQueuePipeline
+    executed = WorkQueuePipeline().work(stop_when_idle=False)
+    logger.info(f"Worker finished after executing {executed} tasks.")
+elif args.stages:
+    from src.config.configuration import ConfigurationManager
+    from src.components.coordination import CoordinationStore, PipelineLease
+    from src.components.memory_budget import MemoryBudget
 
-
-# --- STAGE 4: DATA MODELLING ---
-STAGE_NAME = "Data Modelling stage"
-try:
-    logger.info(f">>>>>> Stage {STAGE_NAME} started <<<<<<") 
-    data_modelling = DataModellingPipeline()
-    data_modelling.main()
-    logger.info(f">>>>>> Stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
-except Exception as e:
-    logger.exception(e)
-    raise e
+    # Only one pipeline run at a time may write to artifacts/ and data/
+    coordination_store = CoordinationStore(ConfigurationManager().get_coordination_config())
+    memory_budget = MemoryBudget(ConfigurationManager().get_memory_config())
+    # The lease fences every output the run swaps into place; a run that loses it aborts
+    with PipelineLease(coordination_store, "pipeline", fence_writes=True) as pipeline_lease:
+        for stage in args.stages:
+            STAGE_NAME, module_name, class_name = STAGES[stage]
+            try:
+                pipeline_lease.ensure_held()
+                logger.info(f">>>>>> Stage {STAGE_NAME} started <<<<<<")
+                with memory_budget.track(STAGE_NAME):
+                    if args.distributed and stage in DISTRIBUTED_STAGES:
+                        from src.pipeline.work_queue import WorkQueuePipeline
+                        getattr(WorkQueuePipeline(), DISTRIBUTED_STAGES[stage])()
+                    else:
+                        pipeline = getattr(importlib.import_module(module_name), class_name)()
+                        pipeline.main()
+                logger.info(f">>>>>> Stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
+            except Exception as e:
+                logger.exception(e)
+                raise e
@@ -0,0 +1,29 @@
+import argparse
+from src.config.configuration import ConfigurationManager
+from src.components.sql_serving import SqlServing
+from src.logger_config import logger
+
+# --- SQL SERVING LAYER ---
+# Usage:
+#   python query.py "SELECT COUNTRY, SUM(NETAMOUNT) FROM fact_sales JOIN dim_customer USING (PARTNERID) GROUP BY 1"
+#   python query.py --serve
+parser = argparse.ArgumentParser(description="Query the presentation tables with SQL.")
+parser.add_argument("sql", nargs="?", help="A read-only SQL statement to run.")
+parser.add_argument("--serve", action="store_true", help="Start the local HTTP query endpoint.")
+args = parser.parse_args()
+
+if not args.sql and not args.serve:
+    parser.error("Provide a SQL statement or --serve.")
+
+try:
+    config = ConfigurationManager()
+    sql_serving = SqlServing(config=config.get_sql_serving_config())
+
+    if args.serve:
+        sql_serving.serve()
+    else:
+        result = sql_serving.query(args.sql)
+        print(result.to_pandas().to_string(index=False))
+except Exception as e:
+    logger.exception(e)
+    raise e
@@ -1,10 +1,22 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import os
+import sys
 from pathlib import Path
 import requests # Import the new library
 
+# 'streamlit run src/app.py' only puts src/ on the path; the project root is needed for 'src.' imports
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.components.chart_data import TIME_GRAINS, RenderTimer, time_series, top_n, compact
+from src.components.kpi_snapshot import PARTNER_ROLE_CHANNELS, conversion_factors, snapshot_value, snapshot_series
+from src.components.geo_index import GeoIndex
+from src.components.text_index import TextIndex
+
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
     page_title="VeloNorth Analytics Dashboard",
@@ -14,7 +26,7 @@ st.set_page_config(
 )
 
 # --- PATHS ---
-PRESENTATION_DIR = Path(__file__).resolve().parent.parent / "data" / "03_presentation"
+PRESENTATION_DIR = PROJECT_ROOT / "data" / "03_presentation"
 
 # --- CURRENCY SYMBOLS ---
 # A dictionary to map currency codes to their symbols for professional formatting
@@ -36,35 +48,66 @@ def get_exchange_rates(base_currency="USD"):
         st.error(f"Could not fetch exchange rates: {e}")
         return None
 
-@st.cache_data
-def load_data():
-    """Loads all necessary parquet files from the presentation layer."""
-    data_files = {
-        "fact_sales": "fact_sales.parquet",
-        "dim_customer": "dim_customer.parquet",
-        "dim_product": "dim_product.parquet",
-        "dim_employee": "dim_employee.parquet",
-        "dim_date": "dim_date.parquet"
-    }
+@st.cache_data(max_entries=8)
+def read_snapshot_version(pointer_mtime_ns):
+    """Reads the CURRENT pointer; cached per pointer mtime so it is read once per published version."""
+    return (PRESENTATION_DIR / "CURRENT").read_text().strip()
+
+def get_current_snapshot():
+    """Returns the directory and version of the published presentation snapshot, or stops the page if there is none."""
+    try:
+        pointer_mtime_ns = os.stat(PRESENTATION_DIR / "CURRENT").st_mtime_ns
+    except FileNotFoundError:
+        st.error("No presentation snapshot has been published yet. Run the data pipeline with `python main.py`.")
+        st.stop()
+    version = read_snapshot_version(pointer_mtime_ns)
+    return PRESENTATION_DIR / "versions" / version, version
+
+@st.cache_data(max_entries=4)
+def load_data(snapshot_dir, version, tables):
+    """Loads the given parquet files of a snapshot; keyed by version, so the cache is invalidated once per published version."""
     df_dict = {}
-    for key, file_name in data_files.items():
-        file_path = os.path.join(PRESENTATION_DIR, file_name)
+    for key in tables:
+        file_path = os.path.join(snapshot_dir, f"{key}.parquet")
         if os.path.exists(file_path):
             df_dict[key] = pd.read_parquet(file_path)
         else:
-            st.error(f"Data file not found: {file_name}")
+            st.error(f"Data file not found: {key}.parquet")
             return None
-            
-    df_dict['fact_sales']['OrderDate'] = pd.to_datetime(df_dict['fact_sales']['OrderDate'])
-    df_dict['dim_date']['Date'] = pd.to_datetime(df_dict['dim_date']['Date'])
+
+    if 'fact_sales' in df_dict:
+        df_dict['fact_sales']['OrderDate'] = pd.to_datetime(df_dict['fact_sales']['OrderDate'])
+    if 'dim_date' in df_dict:
+        df_dict['dim_date']['Date'] = pd.to_datetime(df_dict['dim_date']['Date'])
     
     return df_dict
 
+@st.cache_data(max_entries=4)
+def load_precomputed_table(snapshot_dir, version, table):
+    """Loads a precomputed table of a snapshot (kpi_snapshot, geo_index), or None for snapshots built without it."""
+    file_path = os.path.join(snapshot_dir, f"{table}.parquet")
+    return pd.read_parquet(file_path) if os.path.exists(file_path) else None
+
+@st.cache_resource(max_entries=2)
+def load_text_index(snapshot_dir, version):
+    """Builds the product search index of a snapshot once per version, shared by every rerun and session; None for snapshots built without it."""
+    text_postings = load_precomputed_table(snapshot_dir, version, "text_index")
+    text_ngrams = load_precomputed_table(snapshot_dir, version, "text_ngrams")
+    if text_postings is None or text_ngrams is None:
+        return None
+    return TextIndex(text_postings, text_ngrams)
+
+# Filter label of customers whose company or country is missing
+UNKNOWN_LABEL = "Unknown"
+
+# Dimensions are small and drive the filters; fact_sales is only loaded once a filter leaves its default
+DIMENSION_TABLES = ("dim_customer", "dim_product", "dim_employee", "dim_date")
+
 rates = get_exchange_rates()
-dataframes = load_data()
+snapshot_dir, snapshot_version = get_current_snapshot()
+dataframes = load_data(snapshot_dir, snapshot_version, DIMENSION_TABLES)
 
 if rates and dataframes:
-    fact_sales = dataframes["fact_sales"]
     dim_customer = dataframes["dim_customer"]
     dim_product = dataframes["dim_product"]
     dim_employee = dataframes["dim_employee"]
@@ -85,9 +128,15 @@ if rates and dataframes:
     min_date, max_date = dim_date['Date'].min().date(), dim_date['Date'].max().date()
     date_range = st.sidebar.date_input("Select Date Range", value=(min_date, max_date), min_value=min_date, max_value=max_date)
 
+    # Missing values are real nulls. Like the precomputed default view, sales of customers
+    # with an unknown company or country are kept under an explicit label, while
+    # employees without a full name and products without a category are left out
+    dim_customer['COMPANYNAME'] = dim_customer['COMPANYNAME'].fillna(UNKNOWN_LABEL)
+    dim_customer['COUNTRY'] = dim_customer['COUNTRY'].fillna(UNKNOWN_LABEL)
+
     # --- NEW: Employee Filter ---
     dim_employee['FullName'] = dim_employee['NAME_FIRST'] + ' ' + dim_employee['NAME_LAST']
-    all_employees = sorted(dim_employee['FullName'].unique())
+    all_employees = sorted(dim_employee['FullName'].dropna().unique())
     selected_employees = st.sidebar.multiselect("Select Employee", options=all_employees, default=all_employees)
 
     # --- NEW: Company Filter ---
@@ -97,70 +146,130 @@ if rates and dataframes:
     all_countries = sorted(dim_customer['COUNTRY'].unique())
     selected_countries = st.sidebar.multiselect("Select Country", options=all_countries, default=all_countries)
 
-    if 'SHORT_DESCR_y' in dim_product.columns:
-        all_categories = sorted(dim_product['SHORT_DESCR_y'].unique())
+    if 'CATEGORY_SHORT_DESCR' in dim_product.columns:
+        all_categories = sorted(dim_product['CATEGORY_SHORT_DESCR'].dropna().unique())
         selected_categories = st.sidebar.multiselect("Select Product Category", options=all_categories, default=all_categories)
     else:
         selected_categories = []
 
-    partner_role_map = {'1': 'Reseller', '2': 'Direct Customer'}
-    dim_customer['Channel'] = dim_customer['PARTNERROLE'].map(partner_role_map).fillna('Unknown')
+    # Product search over the descriptions in every language, answered from the precomputed text index
+    text_index = load_text_index(snapshot_dir, snapshot_version)
+    matching_products = None
+    if text_index is not None:
+        product_query = st.sidebar.text_input("Search Products", placeholder="e.g. mountain, bmx jump, 1034")
+        fuzzy_search = st.sidebar.checkbox("Allow typos in search", value=False)
+        if product_query.strip():
+            product_matches = text_index.search(product_query, fuzzy=fuzzy_search)
+            matching_products = product_matches['PRODUCTID'].tolist()
+            st.sidebar.caption(f"{len(matching_products)} matching products")
+
+    dim_customer['Channel'] = dim_customer['PARTNERROLE'].map(PARTNER_ROLE_CHANNELS).fillna(UNKNOWN_LABEL)
     all_channels = sorted(dim_customer['Channel'].unique())
     selected_channels = st.sidebar.multiselect("Select Sales Channel", options=all_channels, default=all_channels)
 
+    # Trend grain; long daily series are downsampled before they are sent to the browser
+    selected_grain = st.sidebar.selectbox("Trend Granularity", options=list(TIME_GRAINS), index=list(TIME_GRAINS).index("Month"))
+
+    # Debug panel with per-chart timings, also enabled with ?debug=1 in the URL
+    show_debug = st.sidebar.checkbox("Show render times", value=st.query_params.get("debug") == "1")
+    timer = RenderTimer()
+
+    # --- MAIN PAGE ---
+    st.title(f"VeloNorth Sales Analytics ({selected_currency})")
+    st.markdown("---")
+
     # --- FILTERING DATA ---
     start_date, end_date = date_range
-    status_col_case_insensitive = next((col for col in fact_sales.columns if col.lower() == 'lifecyclestatus'), None)
-    
-    if not status_col_case_insensitive:
-        st.error("lifecyclestatus column not found. Please re-run the data pipeline.")
-        st.stop()
-        
-    filtered_sales = fact_sales[(fact_sales['OrderDate'].dt.date >= start_date) & (fact_sales['OrderDate'].dt.date <= end_date)]
-    
-    # Merge with dimensions to get filterable columns
-    filtered_sales = pd.merge(filtered_sales, dim_customer[['PARTNERID', 'COUNTRY', 'Channel', 'COMPANYNAME']], on='PARTNERID', how='left')
-    filtered_sales = pd.merge(filtered_sales, dim_employee[['EMPLOYEEID', 'FullName']], on='EMPLOYEEID', how='left') # Merge employee info
-
-    if 'SHORT_DESCR_y' in dim_product.columns:
-        filtered_sales = pd.merge(filtered_sales, dim_product[['PRODUCTID', 'SHORT_DESCR_y']], on='PRODUCTID', how='left')
-        if selected_categories:
-            filtered_sales = filtered_sales[filtered_sales['SHORT_DESCR_y'].isin(selected_categories)]
-
-    if selected_countries:
-        filtered_sales = filtered_sales[filtered_sales['COUNTRY'].isin(selected_countries)]
-    if selected_channels:
-        filtered_sales = filtered_sales[filtered_sales['Channel'].isin(selected_channels)]
-    
-    # --- NEW: Apply Employee and Company Filters ---
-    if selected_employees:
-        filtered_sales = filtered_sales[filtered_sales['FullName'].isin(selected_employees)]
-    if selected_companies:
-        filtered_sales = filtered_sales[filtered_sales['COMPANYNAME'].isin(selected_companies)]
 
+    # The default view (every filter at its default) is precomputed per currency by the
+    # pipeline, so the first paint never waits for fact_sales to load and be filtered
+    filters_at_default = (
+        (start_date, end_date) == (min_date, max_date)
+        and set(selected_employees) == set(all_employees)
+        and set(selected_companies) == set(all_companies)
+        and set(selected_countries) == set(all_countries)
+        and set(selected_channels) == set(all_channels)
+        and ('CATEGORY_SHORT_DESCR' not in dim_product.columns or set(selected_categories) == set(all_categories))
+        and matching_products is None
+    )
+    kpi_snapshot = load_precomputed_table(snapshot_dir, snapshot_version, "kpi_snapshot") if filters_at_default else None
+
+    with timer.measure("Filters & KPIs") as chart:
+        if kpi_snapshot is not None:
+            chart["chart"] = "KPIs (precomputed)"
+            chart["rows"] = len(kpi_snapshot)
+            total_revenue = snapshot_value(kpi_snapshot, 'revenue', rates, selected_currency)
+            total_orders = int(snapshot_value(kpi_snapshot, 'orders'))
+            total_quantity = int(snapshot_value(kpi_snapshot, 'quantity'))
+
+            # Chart inputs, already summed per label; the chart helpers aggregate them further
+            revenue_by_category = snapshot_series(kpi_snapshot, 'category', 'CATEGORY_SHORT_DESCR', 'ConvertedNetAmount', rates, selected_currency)
+            revenue_by_channel = snapshot_series(kpi_snapshot, 'channel', 'Channel', 'ConvertedNetAmount', rates, selected_currency)
+            revenue_by_date = snapshot_series(kpi_snapshot, 'daily', 'OrderDate', 'ConvertedNetAmount', rates, selected_currency)
+            revenue_by_date['OrderDate'] = pd.to_datetime(revenue_by_date['OrderDate'])
+            revenue_by_customer = snapshot_series(kpi_snapshot, 'customer', 'COMPANYNAME', 'ConvertedNetAmount', rates, selected_currency)
+            status_counts = snapshot_series(kpi_snapshot, 'status', 'Lifecycle Status', 'Order Count').astype({'Order Count': 'int64'})
+        else:
+            fact_data = load_data(snapshot_dir, snapshot_version, ("fact_sales",))
+            if not fact_data:
+                st.stop()
+            fact_sales = fact_data["fact_sales"]
+            status_col_case_insensitive = next((col for col in fact_sales.columns if col.lower() == 'lifecyclestatus'), None)
+
+            if not status_col_case_insensitive:
+                st.error("lifecyclestatus column not found. Please re-run the data pipeline.")
+                st.stop()
+
+            filtered_sales = fact_sales[(fact_sales['OrderDate'].dt.date >= start_date) & (fact_sales['OrderDate'].dt.date <= end_date)]
+
+            # Merge with dimensions to get filterable columns
+            filtered_sales = pd.merge(filtered_sales, dim_customer[['PARTNERID', 'COUNTRY', 'Channel', 'COMPANYNAME']], on='PARTNERID', how='left')
+            filtered_sales = pd.merge(filtered_sales, dim_employee[['EMPLOYEEID', 'FullName']], on='EMPLOYEEID', how='left') # Merge employee info
+
+            if 'CATEGORY_SHORT_DESCR' in dim_product.columns:
+                filtered_sales = pd.merge(filtered_sales, dim_product[['PRODUCTID', 'CATEGORY_SHORT_DESCR']], on='PRODUCTID', how='left')
+                if selected_categories:
+                    filtered_sales = filtered_sales[filtered_sales['CATEGORY_SHORT_DESCR'].isin(selected_categories)]
+
+            if matching_products is not None:
+                filtered_sales = filtered_sales[filtered_sales['PRODUCTID'].isin(matching_products)]
+            if selected_countries:
+                filtered_sales = filtered_sales[filtered_sales['COUNTRY'].isin(selected_countries)]
+            if selected_channels:
+                filtered_sales = filtered_sales[filtered_sales['Channel'].isin(selected_channels)]
+
+            # --- NEW: Apply Employee and Company Filters ---
+            if selected_employees:
+                filtered_sales = filtered_sales[filtered_sales['FullName'].isin(selected_employees)]
+            if selected_companies:
+                filtered_sales = filtered_sales[filtered_sales['COMPANYNAME'].isin(selected_companies)]
+            chart["rows"] = len(filtered_sales)
+
+            # --- DYNAMIC CURRENCY CONVERSION ---
+            # One factor per currency, applied to the whole column at once
+            filtered_sales['ConvertedNetAmount'] = (
+                filtered_sales['NETAMOUNT'].to_numpy(dtype='float64', na_value=float('nan'))
+                * conversion_factors(filtered_sales['CURRENCY'], rates, selected_currency)
+            )
 
-    # --- DYNAMIC CURRENCY CONVERSION ---
-    def convert_currency(row):
-        from_currency_rate = rates.get(row['CURRENCY'], 1)
-        to_currency_rate = rates.get(selected_currency, 1)
-        # Avoid division by zero if a rate is missing or zero
-        if from_currency_rate == 0: return 0
-        return row['NETAMOUNT'] * (to_currency_rate / from_currency_rate)
-
-    filtered_sales['ConvertedNetAmount'] = filtered_sales.apply(convert_currency, axis=1)
+            # --- KPIs based on Completed Sales and Converted Currency ---
+            completed_sales = filtered_sales[filtered_sales[status_col_case_insensitive].eq('C').fillna(False)]
 
+            total_revenue = completed_sales['ConvertedNetAmount'].sum()
+            total_orders = completed_sales['SALESORDERID'].nunique()
+            total_quantity = completed_sales['QUANTITY'].sum()
 
-    # --- MAIN PAGE ---
-    st.title(f"VeloNorth Sales Analytics ({selected_currency})")
-    st.markdown("---")
+            # CORRECTED: Use completed_sales for consistency
+            revenue_by_category = completed_sales[['CATEGORY_SHORT_DESCR', 'ConvertedNetAmount']] if 'CATEGORY_SHORT_DESCR' in completed_sales.columns else None
+            revenue_by_channel = completed_sales[['Channel', 'ConvertedNetAmount']]
+            revenue_by_date = completed_sales[['OrderDate', 'ConvertedNetAmount']]
+            revenue_by_customer = completed_sales[['COMPANYNAME', 'ConvertedNetAmount']]
 
-    # --- KPIs based on Completed Sales and Converted Currency ---
-    completed_sales = filtered_sales[filtered_sales[status_col_case_insensitive] == 'C']
+            # This chart intentionally uses all filtered_sales to show the full status picture
+            status_counts = filtered_sales.groupby(status_col_case_insensitive)['SALESORDERID'].nunique().reset_index()
+            status_counts.rename(columns={'SALESORDERID': 'Order Count', status_col_case_insensitive: 'Lifecycle Status'}, inplace=True)
 
-    total_revenue = completed_sales['ConvertedNetAmount'].sum()
-    total_orders = completed_sales['SALESORDERID'].nunique()
     avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
-    total_quantity = completed_sales['QUANTITY'].sum()
 
     kpi1, kpi2, kpi3, kpi4 = st.columns(4)
     kpi1.metric(label="Total Net Revenue (Completed)", value=f"{currency_symbol}{total_revenue:,.2f}")
@@ -173,56 +282,57 @@ if rates and dataframes:
     # --- CHARTS ---
     col1, col2 = st.columns(2)
 
-    with col1:
+    # Every chart only receives its aggregated, capped and narrowed data (see src/components/chart_data.py)
+    with col1, timer.measure("Revenue by category") as chart:
         st.subheader("Net Revenue by Product Category")
-        if 'SHORT_DESCR_y' in filtered_sales.columns:
-            # CORRECTED: Use completed_sales for consistency
-            revenue_by_category = completed_sales.groupby('SHORT_DESCR_y')['ConvertedNetAmount'].sum().sort_values(ascending=False).reset_index()
+        if revenue_by_category is not None:
+            revenue_by_category = compact(top_n(revenue_by_category, 'CATEGORY_SHORT_DESCR', 'ConvertedNetAmount', 10))
+            chart["rows"] = len(revenue_by_category)
             fig_cat = px.bar(
-                revenue_by_category.head(10), x='ConvertedNetAmount', y='SHORT_DESCR_y', orientation='h',
-                labels={'ConvertedNetAmount': f'Total Net Revenue ({currency_symbol})', 'SHORT_DESCR_y': 'Product Category'}, template='plotly_white'
+                revenue_by_category, x='ConvertedNetAmount', y='CATEGORY_SHORT_DESCR', orientation='h',
+                labels={'ConvertedNetAmount': f'Total Net Revenue ({currency_symbol})', 'CATEGORY_SHORT_DESCR': 'Product Category'}, template='plotly_white'
             )
             fig_cat.update_layout(yaxis={'categoryorder':'total ascending'}, title_text='Top 10 Product Categories by Net Revenue')
             st.plotly_chart(fig_cat, use_container_width=True)
         else:
             st.warning("Product Category information not available.")
 
-    with col2:
+    with col2, timer.measure("Revenue by channel") as chart:
         st.subheader("Net Revenue by Sales Channel")
-        # CORRECTED: Use completed_sales for consistency
-        revenue_by_channel = completed_sales.groupby('Channel')['ConvertedNetAmount'].sum().reset_index()
+        revenue_by_channel = compact(revenue_by_channel.groupby('Channel')['ConvertedNetAmount'].sum().reset_index())
+        chart["rows"] = len(revenue_by_channel)
         fig_channel = px.pie(
             revenue_by_channel, values='ConvertedNetAmount', names='Channel',
             title='Net Revenue Distribution by Sales Channel', hole=.4, template='plotly_white'
         )
         st.plotly_chart(fig_channel, use_container_width=True)
 
-    st.markdown("### Monthly Net Revenue Trend")
-    # CORRECTED: Use completed_sales for consistency
-    sales_over_time = completed_sales.set_index('OrderDate').resample('ME')['ConvertedNetAmount'].sum().reset_index()
-    fig_time = px.line(
-        sales_over_time, x='OrderDate', y='ConvertedNetAmount',
-        title='Monthly Net Revenue', labels={'ConvertedNetAmount': f'Total Net Revenue ({currency_symbol})', 'OrderDate': 'Month'}, template='plotly_white'
-    )
-    fig_time.update_yaxes(rangemode="tozero")
-    st.plotly_chart(fig_time, use_container_width=True)
+    with timer.measure("Revenue trend") as chart:
+        st.markdown(f"### Net Revenue Trend by {selected_grain}")
+        sales_over_time = time_series(revenue_by_date, 'OrderDate', 'ConvertedNetAmount', selected_grain)
+        chart["rows"] = len(sales_over_time)
+        fig_time = px.line(
+            sales_over_time, x='OrderDate', y='ConvertedNetAmount',
+            title=f'Net Revenue per {selected_grain}', labels={'ConvertedNetAmount': f'Total Net Revenue ({currency_symbol})', 'OrderDate': selected_grain}, template='plotly_white'
+        )
+        fig_time.update_yaxes(rangemode="tozero")
+        st.plotly_chart(fig_time, use_container_width=True)
     
     st.markdown("---")
     
     # --- DETAILED ANALYSIS ROW ---
     col3, col4 = st.columns(2)
     
-    with col3:
+    with col3, timer.measure("Top customers") as chart:
         st.subheader("Top 10 Customers by Net Revenue")
-        # CORRECTED: Use completed_sales DataFrame for consistency with KPIs
-        top_customers = completed_sales.groupby('COMPANYNAME')['ConvertedNetAmount'].sum().sort_values(ascending=False).reset_index().head(10)
+        top_customers = top_n(revenue_by_customer, 'COMPANYNAME', 'ConvertedNetAmount', 10)
+        chart["rows"] = len(top_customers)
         st.dataframe(top_customers)
         
-    with col4:
+    with col4, timer.measure("Order status") as chart:
         st.subheader("Order Status Analysis")
-        # This chart intentionally uses all filtered_sales to show the full status picture
-        status_counts = filtered_sales.groupby(status_col_case_insensitive)['SALESORDERID'].nunique().reset_index()
-        status_counts.rename(columns={'SALESORDERID': 'Order Count', status_col_case_insensitive: 'Lifecycle Status'}, inplace=True)
+        status_counts = compact(status_counts)
+        chart["rows"] = len(status_counts)
         fig_status = px.bar(
             status_counts, x='Lifecycle Status', y='Order Count',
             title='Order Count by Lifecycle Status', labels={'Lifecycle Status': 'Status Code', 'Order Count': 'Number of Orders'},
@@ -230,6 +340,95 @@ if rates and dataframes:
         )
         st.plotly_chart(fig_status, use_container_width=True)
 
+    # --- REVENUE MAP ---
+    # Answered from the precomputed geohash index, so it never scans fact_sales
+    geo_cells = load_precomputed_table(snapshot_dir, snapshot_version, "geo_index")
+    if geo_cells is not None and len(geo_cells):
+        st.markdown("---")
+        st.markdown("### Completed Net Revenue by Location")
+        geo_index = GeoIndex(geo_cells)
+        with timer.measure("Revenue map") as chart:
+            map_col, options_col = st.columns([3, 1])
+            with options_col:
+                map_precision = st.slider("Map detail (geohash precision)", 1, geo_index.max_precision, min(3, geo_index.max_precision))
+                radius_km = st.number_input("Radius filter (km, 0 = off)", min_value=0.0, value=0.0, step=50.0)
+                center_lat = st.number_input("Radius centre latitude", min_value=-90.0, max_value=90.0, value=0.0)
+                center_lon = st.number_input("Radius centre longitude", min_value=-180.0, max_value=180.0, value=0.0)
+
+            if radius_km > 0:
+                cells = geo_index.within_radius(map_precision, center_lat, center_lon, radius_km)
+            else:
+                cells = geo_index.level(map_precision)
+            cells = cells.assign(ConvertedNetAmount=cells['NET_REVENUE'].to_numpy(dtype='float64', na_value=0)
+                                 * conversion_factors(cells['CURRENCY'], rates, selected_currency))
+            cells = compact(cells.groupby('GEOHASH', as_index=False).agg(
+                LATITUDE=('LATITUDE', 'mean'), LONGITUDE=('LONGITUDE', 'mean'),
+                ConvertedNetAmount=('ConvertedNetAmount', 'sum'), ORDERS=('ORDERS', 'sum'),
+                # Distinct over all currencies; summing the per-currency counts would count a customer once per currency
+                CUSTOMERS=('CELL_CUSTOMERS', 'first')
+            ))
+            chart["rows"] = len(cells)
+
+            with map_col:
+                fig_map = px.scatter_geo(
+                    cells, lat='LATITUDE', lon='LONGITUDE', size='ConvertedNetAmount', hover_name='GEOHASH',
+                    hover_data={'ORDERS': True, 'CUSTOMERS': True},
+                    labels={'ConvertedNetAmount': f'Net Revenue ({currency_symbol})'}, template='plotly_white'
+                )
+                st.plotly_chart(fig_map, use_container_width=True)
+                st.caption(f"{currency_symbol}{cells['ConvertedNetAmount'].sum():,.2f} in {len(cells)} cells. "
+                           "All completed sales by customer location; only the currency filter applies.")
+
+    # --- CUSTOMER VALUE ---
+    # Order-grain and per-customer metrics are precomputed by the pipeline (fact_orders, customer_metrics)
+    fact_orders = load_precomputed_table(snapshot_dir, snapshot_version, "fact_orders")
+    customer_rfm = load_precomputed_table(snapshot_dir, snapshot_version, "customer_metrics")
+    if fact_orders is not None and customer_rfm is not None:
+        st.markdown("---")
+        st.markdown("### Customer Value")
+        col5, col6 = st.columns(2)
+
+        with col5, timer.measure("Order value distribution") as chart:
+            st.subheader("Completed Order Value Distribution")
+            completed_orders = fact_orders[fact_orders['LifecycleStatus'].eq('C').fillna(False)]
+            order_values = (completed_orders['NETAMOUNT'].to_numpy(dtype='float64', na_value=0)
+                            * conversion_factors(completed_orders['CURRENCY'], rates, selected_currency))
+            # Binned here, so the chart receives 30 bars instead of one point per order
+            counts, edges = np.histogram(order_values, bins=30) if len(order_values) else (np.array([]), np.array([0.0]))
+            order_histogram = compact(pd.DataFrame({'OrderValue': (edges[:-1] + edges[1:]) / 2, 'Orders': counts}))
+            chart["rows"] = len(order_histogram)
+            fig_orders = px.bar(
+                order_histogram, x='OrderValue', y='Orders',
+                labels={'OrderValue': f'Order Net Value ({currency_symbol})', 'Orders': 'Number of Orders'}, template='plotly_white'
+            )
+            st.plotly_chart(fig_orders, use_container_width=True)
+
+        with col6, timer.measure("Customer RFM") as chart:
+            st.subheader("Top 10 Customers by RFM")
+            factors = conversion_factors(customer_rfm['CURRENCY'], rates, selected_currency)
+            top_rfm = customer_rfm.assign(
+                Monetary=customer_rfm['MONETARY'].to_numpy(dtype='float64') * factors,
+                Revenue90D=customer_rfm['NET_REVENUE_90D'].to_numpy(dtype='float64') * factors
+            ).merge(dim_customer[['PARTNERID', 'COMPANYNAME']], on='PARTNERID', how='left')
+            top_rfm = top_rfm.sort_values(['RFM_SEGMENT', 'Monetary'], ascending=False, na_position='last').head(10)[
+                ['COMPANYNAME', 'RFM_SEGMENT', 'RECENCY_DAYS', 'FREQUENCY', 'Monetary', 'Revenue90D']
+            ]
+            chart["rows"] = len(top_rfm)
+            st.dataframe(top_rfm, hide_index=True)
+        as_of = customer_rfm['AS_OF_DATE'].max()
+        as_of_label = f"{as_of:%Y-%m-%d}" if pd.notna(as_of) else "n/a"
+        st.caption(f"All customers and completed orders up to {as_of_label}; only the currency filter applies.")
+
+    if show_debug:
+        with st.expander("Debug: chart render times", expanded=True):
+            render_times = timer.to_frame()
+            st.caption(f"Total: {render_times['ms'].sum():,.1f} ms for {len(render_times)} charts")
+            st.dataframe(render_times, hide_index=True)
+
+    # After the precomputed first paint, load fact_sales so that the first filter change is fast
+    if kpi_snapshot is not None:
+        load_data(snapshot_dir, snapshot_version, ("fact_sales",))
+
 else:
     st.warning("Data could not be loaded or exchange rates could not be fetched. Please check your connection and ensure the data pipeline has been run successfully.")
 
@@ -0,0 +1,130 @@
+import time
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+
+# Time grains offered by the dashboard, mapped to pandas period frequencies
+TIME_GRAINS = {"Day": "D", "Week": "W", "Month": "M", "Quarter": "Q", "Year": "Y"}
+
+# Most points drawn for one line series; longer series are downsampled with LTTB
+MAX_SERIES_POINTS = 1000
+
+# Most rows sent to the browser for one table or bar chart
+MAX_TABLE_ROWS = 100
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling. Keeps the first and last
+    points, and from each of 'threshold' - 2 equal buckets in between the point
+    forming the largest triangle with the point kept before it and the mean
+    of the next bucket. Peaks and dips survive, unlike with plain averaging.
+
+    Args:
+        x (np.ndarray): Increasing x values (datetimes are used as integers).
+        y (np.ndarray): The y values.
+        threshold (int): Number of points to keep.
+
+    Returns:
+        np.ndarray: Positions of the kept points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    x = (x.astype('int64') if np.issubdtype(x.dtype, np.datetime64) else x).astype('float64')
+    y = np.asarray(y, dtype='float64')
+
+    # Bucket i spans [bounds[i], bounds[i + 1]); the last bucket is the last point alone
+    every = (n - 2) / (threshold - 2)
+    bounds = np.append(np.floor(np.arange(threshold - 1) * every).astype('int64') + 1, n)
+
+    kept = np.empty(threshold, dtype='int64')
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end, next_end = bounds[i], bounds[i + 1], bounds[i + 2]
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        kept[i + 1] = a
+    return kept
+
+
+def time_series(df: pd.DataFrame, date_col: str, value_col: str, grain: str = "Month",
+                max_points: int = MAX_SERIES_POINTS) -> pd.DataFrame:
+    """
+    Sums a value per period of the chosen time grain and downsamples the
+    result with LTTB if it still has more than 'max_points' periods. Periods
+    without rows are kept as zeros, so the line does not skip gaps.
+
+    Returns:
+        pd.DataFrame: Compact columns [date_col, value_col], one row per (kept) period.
+    """
+    periods = df[date_col].dt.to_period(TIME_GRAINS[grain])
+    series = df[value_col].groupby(periods, observed=True, sort=True).sum()
+    if not series.empty:
+        series = series.reindex(pd.period_range(series.index.min(), series.index.max()), fill_value=0)
+
+    # Periods are labelled by their last day, like resample('ME')
+    result = pd.DataFrame({
+        date_col: series.index.to_timestamp(how='end').normalize(),
+        value_col: series.to_numpy(dtype='float64')
+    })
+    result = result.iloc[lttb(result[date_col].to_numpy(), result[value_col].to_numpy(), max_points)]
+    return compact(result.reset_index(drop=True))
+
+
+def top_n(df: pd.DataFrame, group_col: str, value_col: str, n: int = 10) -> pd.DataFrame:
+    """
+    Sums a value per group and returns only the 'n' largest groups, capped at MAX_TABLE_ROWS.
+    Values keep their precision, as the result may be shown as a table; pass
+    it through compact() before plotting.
+    """
+    totals = df.groupby(group_col, observed=True)[value_col].sum().nlargest(min(n, MAX_TABLE_ROWS))
+    return totals.reset_index()
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Narrows a chart frame before it is sent to the browser: integer columns
+    (counts, quantities) become the smallest type that fits. Plotly ships
+    numeric numpy columns as binary typed arrays, so this shrinks their payload.
+    Floats stay float64: float32 keeps only about 7 significant digits, so
+    amounts in the millions would lose their cents in the hover labels.
+    """
+    df = df.copy()
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_integer_dtype(values) and not values.hasnans:
+            df[col] = pd.to_numeric(values.to_numpy(dtype='int64'), downcast='integer')
+    return df
+
+
+class RenderTimer:
+    def __init__(self):
+        """
+        Collects how long each chart or table took to prepare and render, and
+        how many rows it sent, for the dashboard's debug panel.
+        """
+        self.records = []
+
+    @contextmanager
+    def measure(self, name: str):
+        """
+        Times the enclosed block. Set 'rows' on the yielded dict to record the payload size.
+        """
+        record = {"chart": name, "rows": None}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["ms"] = round((time.perf_counter() - start) * 1000, 1)
+            self.records.append(record)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the records as a DataFrame, slowest first.
+        """
+        return pd.DataFrame(self.records, columns=["chart", "rows", "ms"]).sort_values("ms", ascending=False)
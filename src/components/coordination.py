@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from src.logger_config import logger
+from src.entity.config_entity import CoordinationConfig
+
+
+class LeaseUnavailableError(RuntimeError):
+    """Raised when a lease is currently held by another owner."""
+
+
+class LeaseLostError(RuntimeError):
+    """Raised when a lease expired or was taken over while its holder was still working."""
+
+
+# The lease that fences this process's writes to artifacts/ and data/, while one is held
+_write_fence = None
+
+
+def check_write_fence():
+    """
+    Raises LeaseLostError if this process writes under a lease it no longer
+    holds. Called right before an output is swapped into place, so a run that
+    lost the pipeline lease cannot overwrite the outputs of the next holder.
+    """
+    if _write_fence is not None:
+        _write_fence.ensure_held()
+
+
+def new_owner_id() -> str:
+    """
+    Returns an identifier for this process that is unique across hosts.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class CoordinationStore:
+    def __init__(self, config: CoordinationConfig):
+        """
+        Initializes the SQLite database shared by all pipeline runs and workers.
+        SQLite's locks are only reliable on a local filesystem, so the runs and
+        workers must be on the same host as the database.
+        It holds the leases and the task queue.
+        """
+        self.config = config
+        os.makedirs(Path(config.database).parent, exist_ok=True)
+        with self.connect() as connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS tasks (
+                    run_id TEXT NOT NULL,
+                    task_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    PRIMARY KEY (run_id, task_id)
+                );
+            """)
+
+    @contextmanager
+    def connect(self):
+        """
+        Opens a connection in autocommit mode and closes it afterwards. Writers
+        use explicit BEGIN IMMEDIATE transactions so that competing processes
+        are serialised by SQLite's lock; an unfinished transaction is rolled back on close.
+        """
+        connection = sqlite3.connect(self.config.database, timeout=30, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+
+class Heartbeat(threading.Thread):
+    def __init__(self, interval: float, beat):
+        """
+        Calls 'beat' every 'interval' seconds in the background until stopped.
+        Used to renew leases while long-running work is in progress.
+        """
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.beat = beat
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.beat()
+            except Exception as e:
+                logger.error(f"Lease renewal failed: {e}")
+
+    def stop(self):
+        self._stopped.set()
+
+
+class PipelineLease:
+    def __init__(self, store: CoordinationStore, name: str, owner: str = None, fence_writes: bool = False):
+        """
+        An exclusive, expiring lease on a named resource (e.g. the whole pipeline).
+        A lease that is not renewed expires after lease_seconds, so a crashed
+        holder never blocks other runs forever. Use it as a context manager.
+        With 'fence_writes', every output this process swaps into place while
+        holding the lease is checked against it (see check_write_fence).
+        """
+        self.store = store
+        self.name = name
+        self.owner = owner or new_owner_id()
+        self.fence_writes = fence_writes
+        self._heartbeat = None
+        self._expires_at = 0.0
+        self._lost = threading.Event()
+
+    def acquire(self):
+        """
+        Takes the lease, or raises LeaseUnavailableError if another owner holds an unexpired one.
+        """
+        now = time.time()
+        with self.store.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+            if row and row[0] != self.owner and row[1] > now:
+                connection.execute("ROLLBACK")
+                raise LeaseUnavailableError(
+                    f"Lease '{self.name}' is held by {row[0]} for another {row[1] - now:.0f}s."
+                )
+            connection.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                (self.name, self.owner, now + self.store.config.lease_seconds)
+            )
+            connection.execute("COMMIT")
+        self._expires_at = now + self.store.config.lease_seconds
+        self._lost.clear()
+        logger.info(f"Acquired lease '{self.name}' as {self.owner}")
+
+        if self.fence_writes:
+            global _write_fence
+            _write_fence = self
+        self._heartbeat = Heartbeat(self.store.config.lease_seconds / 3, self.renew)
+        self._heartbeat.start()
+
+    def renew(self):
+        """
+        Extends the lease. If it was lost to another owner, it is marked lost
+        and ensure_held() fails from then on.
+        """
+        now = time.time()
+        with self.store.connect() as connection:
+            updated = connection.execute(
+                "UPDATE leases SET expires_at = ? WHERE name = ? AND owner = ? AND expires_at >= ?",
+                (now + self.store.config.lease_seconds, self.name, self.owner, now)
+            ).rowcount
+        if updated:
+            self._expires_at = now + self.store.config.lease_seconds
+        elif not self._lost.is_set():
+            self._lost.set()
+            logger.error(f"Lease '{self.name}' was lost by {self.owner}; its writes are refused from now on")
+
+    def ensure_held(self):
+        """
+        Raises LeaseLostError if the lease was lost, or has expired because it
+        could not be renewed in time.
+        """
+        if self._lost.is_set() or time.time() >= self._expires_at:
+            raise LeaseLostError(f"Lease '{self.name}' is no longer held by {self.owner}; aborting.")
+
+    def release(self):
+        """
+        Stops renewing and gives the lease up.
+        """
+        global _write_fence
+        if _write_fence is self:
+            _write_fence = None
+        if self._heartbeat:
+            self._heartbeat.stop()
+            self._heartbeat = None
+        with self.store.connect() as connection:
+            connection.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (self.name, self.owner))
+        logger.info(f"Released lease '{self.name}'")
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class TaskQueue:
+    def __init__(self, store: CoordinationStore):
+        """
+        A persistent work queue in the coordination database. Workers claim
+        tasks under an expiring lease; tasks whose worker dies or fails are
+        retried until max_attempts is reached. A run is active while the
+        process that started it holds its run lease; the unfinished tasks of
+        a run whose lease has expired are abandoned instead of being claimed.
+        """
+        self.store = store
+        self.config = store.config
+
+    def enqueue(self, run_id: str, stage: str, tasks: dict):
+        """
+        Adds tasks for a run. 'tasks' maps each task_id to its JSON-serialisable payload.
+        """
+        with self.store.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT OR IGNORE INTO tasks (run_id, task_id, stage, payload) VALUES (?, ?, ?, ?)",
+                [(run_id, task_id, stage, json.dumps(payload)) for task_id, payload in tasks.items()]
+            )
+            connection.execute("COMMIT")
+        logger.info(f"Enqueued {len(tasks)} '{stage}' tasks for run {run_id}")
+
+    def run_lease(self, run_id: str, owner: str) -> PipelineLease:
+        """
+        Returns the lease that keeps a run's tasks claimable. Take it before
+        enqueueing the tasks and hold it until the run has finished.
+        """
+        return PipelineLease(self.store, f"run:{run_id}", owner)
+
+    def claim(self, owner: str, run_id: str = None):
+        """
+        Atomically claims the next pending task, or a running task whose lease
+        has expired. Running tasks that expired on their last attempt are
+        marked failed, and unfinished tasks of runs without a live run lease
+        are marked abandoned.
+
+        Returns:
+            tuple | None: (run_id, task_id, stage, payload), or None if nothing is claimable.
+        """
+        now = time.time()
+        run_filter, run_args = ("AND run_id = ?", (run_id,)) if run_id else ("", ())
+        with self.store.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "UPDATE tasks SET status = 'failed', error = 'lease expired on last attempt' "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (now, self.config.max_attempts)
+            )
+            abandoned = connection.execute(
+                "UPDATE tasks SET status = 'abandoned', error = 'run is no longer active' "
+                "WHERE status IN ('pending', 'running') AND NOT EXISTS ("
+                "SELECT 1 FROM leases WHERE name = 'run:' || tasks.run_id AND expires_at >= ?)",
+                (now,)
+            ).rowcount
+            if abandoned:
+                logger.warning(f"Abandoned {abandoned} tasks of runs that are no longer active")
+            row = connection.execute(
+                "SELECT run_id, task_id, stage, payload FROM tasks "
+                "WHERE (status = 'pending' OR (status = 'running' AND lease_expires < ?)) "
+                f"AND attempts < ? {run_filter} ORDER BY attempts, run_id, task_id LIMIT 1",
+                (now, self.config.max_attempts) + run_args
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute(
+                "UPDATE tasks SET status = 'running', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE run_id = ? AND task_id = ?",
+                (owner, now + self.config.lease_seconds, row[0], row[1])
+            )
+            connection.execute("COMMIT")
+        return row[0], row[1], row[2], json.loads(row[3])
+
+    def renew(self, run_id: str, task_id: str, owner: str):
+        """
+        Extends the lease of a running task held by 'owner'.
+        """
+        with self.store.connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE run_id = ? AND task_id = ? AND owner = ? AND status = 'running'",
+                (time.time() + self.config.lease_seconds, run_id, task_id, owner)
+            )
+
+    def complete(self, run_id: str, task_id: str, owner: str):
+        """
+        Marks a task as done. Ignored unless the task is still running under
+        'owner', e.g. after it was abandoned or re-claimed by another worker.
+        """
+        with self.store.connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = 'done', error = NULL "
+                "WHERE run_id = ? AND task_id = ? AND owner = ? AND status = 'running'",
+                (run_id, task_id, owner)
+            )
+
+    def skip(self, run_id: str, task_id: str, owner: str, reason: str):
+        """
+        Marks a task as finished without output (e.g. a file that failed schema
+        validation), so it is neither retried nor counted as a failure.
+        Ignored unless the task is still running under 'owner'.
+        """
+        with self.store.connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = 'skipped', error = ? "
+                "WHERE run_id = ? AND task_id = ? AND owner = ? AND status = 'running'",
+                (reason, run_id, task_id, owner)
+            )
+
+    def fail(self, run_id: str, task_id: str, owner: str, error: str):
+        """
+        Records a failed attempt; the task is retried until max_attempts is reached.
+        Ignored unless the task is still running under 'owner'.
+        """
+        with self.store.connect() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, error = ? "
+                "WHERE run_id = ? AND task_id = ? AND owner = ? AND status = 'running'",
+                (self.config.max_attempts, error, run_id, task_id, owner)
+            )
+
+    def progress(self, run_id: str) -> dict:
+        """
+        Returns the number of tasks per status for a run.
+        """
+        with self.store.connect() as connection:
+            rows = connection.execute(
+                "SELECT status, COUNT(*) FROM tasks WHERE run_id = ? GROUP BY status", (run_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def failures(self, run_id: str) -> dict:
+        """
+        Returns the last error of each permanently failed or abandoned task of a run.
+        """
+        with self.store.connect() as connection:
+            rows = connection.execute(
+                "SELECT task_id, error FROM tasks WHERE run_id = ? AND status IN ('failed', 'abandoned')", (run_id,)
+            ).fetchall()
+        return dict(rows)
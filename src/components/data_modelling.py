@@ -1,99 +1,413 @@
 import os
+import shutil
+from datetime import datetime, timezone
 import pandas as pd
+import pyarrow.dataset as ds
 from pathlib import Path
 from src.logger_config import logger
 from src.entity.config_entity import DataModellingConfig
+from src.utils import save_parquet, open_parquet_writer, write_parquet_batch
+from src.components.coordination import check_write_fence
+from src.components.join_engine import JoinEngine
+from src.components.kpi_snapshot import KpiSnapshotBuilder
+from src.components.geo_index import CustomerSalesBuilder, build_geo_index
+from src.components.text_index import build_text_index, build_ngram_index
+from src.components.order_metrics import order_totals, combine_order_totals, update_order_windows, customer_metrics
+from src.components.memory_budget import MemoryBudget, format_bytes
+
+# Order columns joined onto every sales order item, and their names in fact_sales
+ORDER_DETAIL_COLUMNS = ['PARTNERID', 'CREATEDBY', 'CREATEDAT', 'BILLINGSTATUS', 'DELIVERYSTATUS', 'LIFECYCLESTATUS']
+ORDER_DETAIL_RENAMES = {
+    'CREATEDAT': 'OrderDate',
+    'CREATEDBY': 'EMPLOYEEID',
+    'BILLINGSTATUS': 'BillingStatus',
+    'DELIVERYSTATUS': 'DeliveryStatus',
+    'LIFECYCLESTATUS': 'LifecycleStatus'
+}
 
 class DataModelling:
+    # Presentation tables in build order; each one is produced by its _build_<table> method
+    PRESENTATION_TABLES = ["dim_customer", "dim_product", "dim_employee", "dim_date", "fact_sales", "kpi_snapshot", "geo_index",
+                          "fact_orders", "customer_metrics", "text_index", "text_ngrams"]
+
     def __init__(self, config: DataModellingConfig):
         """
         Initializes the DataModelling component with its configuration.
         """
         self.config = config
+        self._tables = {}
+        self._built = {}
+        self._fact_sales_aggregates = None
+        self._modelling_mode = None
+        self.memory = MemoryBudget(config.memory)
+        self.join_engine = JoinEngine(
+            engine=config.join_engine,
+            spill_dir=config.spill_dir,
+            partitions=config.join_partitions,
+            spill=config.join_spill,
+            memory=self.memory
+        )
+
+    def _load_processed_table(self, table_name: str) -> pd.DataFrame:
+        """
+        Loads a processed Parquet file into a pandas DataFrame on first use.
+        Tables are only read when a builder needs them, so building one table
+        (or streaming fact_sales) does not load the whole processed layer.
+        """
+        if table_name not in self._tables:
+            path = Path(self.config.processed_data_path) / f"{table_name}.parquet"
+            self._tables[table_name] = pd.read_parquet(path)
+            logger.info(f"Loaded processed table {table_name} ({len(self._tables[table_name])} rows).")
+        return self._tables[table_name]
+
+    def _presentation_table(self, table_name: str) -> pd.DataFrame:
+        """
+        Builds a presentation table on first use with its _build_<table> method.
+        Tables that several others are derived from (fact_sales, the dimensions,
+        fact_orders) are then reused instead of being joined again.
+        """
+        if table_name not in self._built:
+            self._built[table_name] = getattr(self, f"_build_{table_name}")()
+        return self._built[table_name]
+
+    def _load_sales_orders(self) -> pd.DataFrame:
+        """
+        Loads SalesOrders with CREATEDAT as a datetime column.
+        """
+        df_sales_orders = self._load_processed_table('SalesOrders')
+        df_sales_orders['CREATEDAT'] = pd.to_datetime(df_sales_orders['CREATEDAT'])
+        return df_sales_orders
+
+    def _join_order_details(self, df_sales_items: pd.DataFrame, df_sales_orders: pd.DataFrame) -> pd.DataFrame:
+        """
+        Enriches sales order items with the projected order columns, renamed
+        for clarity in the final model.
+        """
+        return self.join_engine.left_join(
+            df_sales_items, df_sales_orders, on='SALESORDERID',
+            columns=ORDER_DETAIL_COLUMNS, rename=ORDER_DETAIL_RENAMES, right_name='SalesOrders'
+        )
+
+    def _scan_fact_sales(self):
+        """
+        Yields fact_sales out of core: SalesOrderItems is scanned in batches
+        through a pyarrow dataset and joined against SalesOrders, which the join
+        engine either keeps in memory or spills to disk as hash partitions when
+        it does not fit the memory budget. SalesOrderItems is never loaded whole.
+        """
+        processed_path = Path(self.config.processed_data_path)
+        fact_batches = self.join_engine.left_join_files(
+            processed_path / "SalesOrderItems.parquet", processed_path / "SalesOrders.parquet", on='SALESORDERID',
+            columns=ORDER_DETAIL_COLUMNS, rename=ORDER_DETAIL_RENAMES,
+            batch_rows=self.config.batch_rows, right_name='SalesOrders'
+        )
+        for fact_batch in fact_batches:
+            fact_batch['OrderDate'] = pd.to_datetime(fact_batch['OrderDate'])
+            yield fact_batch
+
+    def _write_fact_sales(self, fact_batches, output_path: Path):
+        """
+        Appends each batch to the fact_sales file as it passes through and
+        yields it on to the next consumer.
+        """
+        # Batches go to a temporary file that replaces the output only once complete
+        tmp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.tmp")
+        writer = None
+        total_rows = 0
+        try:
+            for fact_batch in fact_batches:
+                if writer is None:
+                    writer = open_parquet_writer(tmp_path, fact_batch, self.config.storage)
+                write_parquet_batch(writer, fact_batch, self.config.storage)
+                total_rows += len(fact_batch)
+                yield fact_batch
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            raise ValueError(f"No sales order items found in {self.config.processed_data_path}")
+        check_write_fence()
+        os.replace(tmp_path, output_path)
+        logger.info(f"Streamed fact_sales ({total_rows} rows) to {output_path}")
+
+    def _stream_fact_sales(self, output_path: Path):
+        """
+        Builds fact_sales out of core, appending each scanned batch directly to
+        the output file. The same scan feeds the tables aggregated from fact_sales.
+        """
+        if self._fact_sales_aggregates is None:
+            self._aggregate_fact_sales(output_path)
+            return
+        # The aggregates were computed by an earlier scan that wrote no file
+        for _ in self._write_fact_sales(self._scan_fact_sales(), output_path):
+            pass
+
+    def _aggregate_fact_sales(self, output_path: Path = None) -> dict:
+        """
+        Feeds every consumer of fact_sales from one pass over its batches: the
+        KPI snapshot, the customer sales of geo_index, the order totals of
+        fact_orders and, given an 'output_path', the fact_sales file itself.
+        Out of core this is a single scan of SalesOrderItems however many of
+        these tables are built; the aggregates are kept for the later tables.
+        """
+        if self._fact_sales_aggregates is None:
+            kpi_snapshot = KpiSnapshotBuilder(
+                self._presentation_table('dim_customer'), self._presentation_table('dim_product'), self._presentation_table('dim_employee')
+            )
+            customer_sales = CustomerSalesBuilder()
+            partial_orders = []
+            fact_batches = self._fact_sales_batches()
+            if output_path is not None:
+                fact_batches = self._write_fact_sales(fact_batches, output_path)
+            for fact_batch in fact_batches:
+                kpi_snapshot.add(fact_batch)
+                customer_sales.add(fact_batch)
+                partial_orders.append(order_totals(fact_batch))
+            self._fact_sales_aggregates = {
+                'kpi_snapshot': kpi_snapshot.to_frame(),
+                'customer_sales': customer_sales.to_frame(),
+                'order_totals': combine_order_totals(partial_orders)
+            }
+        return self._fact_sales_aggregates
+
+    def _build_dim_customer(self) -> pd.DataFrame:
+        """
+        Builds dim_customer: business partners enriched with their address.
+        """
+        df_partners = self._load_processed_table('BusinessPartners')
+        df_addresses = self._load_processed_table('Addresses')
+        return self.join_engine.left_join(df_partners, df_addresses, on='ADDRESSID', right_name='Addresses')
+
+    def _build_dim_product(self) -> pd.DataFrame:
+        """
+        Builds dim_product: products enriched with their English category and product texts.
+        """
+        df_products = self._load_processed_table('Products')
+        df_prod_cat_text = self._load_processed_table('ProductCategoryText')
+        df_prod_text = self._load_processed_table('ProductTexts')
+        
+        df_prod_cat_text = df_prod_cat_text[df_prod_cat_text['LANGUAGE'] == 'EN']
+        df_prod_text = df_prod_text[df_prod_text['LANGUAGE'] == 'EN']
+        
+        # Category texts are prefixed so they do not collide with the product texts
+        text_columns = ['SHORT_DESCR', 'MEDIUM_DESCR', 'LONG_DESCR']
+        dim_product = self.join_engine.left_join(
+            df_products, df_prod_cat_text, on='PRODCATEGORYID', columns=text_columns,
+            rename={col: f'CATEGORY_{col}' for col in text_columns}, right_name='ProductCategoryText_EN'
+        )
+        return self.join_engine.left_join(dim_product, df_prod_text, on='PRODUCTID', columns=text_columns, right_name='ProductTexts_EN')
+
+    def _build_dim_employee(self) -> pd.DataFrame:
+        """
+        Builds dim_employee directly from the processed Employees table.
+        """
+        return self._load_processed_table('Employees')
+
+    def _build_dim_date(self) -> pd.DataFrame:
+        """
+        Builds dim_date: one row per day between the first and last order date.
+        """
+        df_sales_orders = self._load_sales_orders()
+        min_date = df_sales_orders['CREATEDAT'].min()
+        max_date = df_sales_orders['CREATEDAT'].max()
+        
+        dim_date = pd.DataFrame({'Date': pd.date_range(min_date, max_date)})
+        dim_date['Year'] = dim_date['Date'].dt.year
+        dim_date['Month'] = dim_date['Date'].dt.month
+        dim_date['Day'] = dim_date['Date'].dt.day
+        dim_date['Quarter'] = dim_date['Date'].dt.quarter
+        dim_date['DayOfWeek'] = dim_date['Date'].dt.dayofweek # Monday=0, Sunday=6
+        return dim_date
+
+    def _build_fact_sales(self) -> pd.DataFrame:
+        """
+        Builds fact_sales in memory: sales order items enriched with their order details.
+        """
+        return self._join_order_details(self._load_processed_table('SalesOrderItems'), self._load_sales_orders())
+
+    def _build_kpi_snapshot(self) -> pd.DataFrame:
+        """
+        Builds kpi_snapshot: the dashboard's default-view KPIs and chart series,
+        summed per currency, so the first page load never has to touch fact_sales.
+        fact_sales comes from the processed tables (scanned in batches in
+        out-of-core mode), so this table does not depend on the other tasks of a snapshot.
+        """
+        return self._aggregate_fact_sales()['kpi_snapshot']
+
+    @property
+    def modelling_mode(self) -> str:
+        """
+        The configured modelling mode, with 'auto' resolved on first use:
+        out_of_core if SalesOrderItems and SalesOrders would not fit the
+        memory budget together, otherwise in_memory.
+        """
+        if self._modelling_mode is None:
+            self._modelling_mode = self.config.modelling_mode
+            if self._modelling_mode == 'auto':
+                paths = [Path(self.config.processed_data_path) / f"{name}.parquet" for name in ('SalesOrderItems', 'SalesOrders')]
+                footprint = sum(self.memory.parquet_footprint(path) for path in paths if path.exists())
+                self._modelling_mode = 'in_memory' if self.memory.fits(footprint) else 'out_of_core'
+                logger.info(f"Sales tables need about {format_bytes(footprint)}; modelling mode '{self._modelling_mode}'")
+        return self._modelling_mode
+
+    def _fact_sales_batches(self):
+        """
+        Returns fact_sales as an iterable of batches: scanned from disk in
+        out-of-core mode, otherwise the whole table, built once in memory.
+        """
+        return self._scan_fact_sales() if self.modelling_mode == 'out_of_core' else [self._presentation_table('fact_sales')]
+
+    def _build_geo_index(self) -> pd.DataFrame:
+        """
+        Builds geo_index: completed net revenue, orders and quantity per
+        customer location, pre-aggregated per geohash cell for every precision
+        up to geo_index_precision, per currency. Map, bounding-box and radius
+        queries are answered from it without scanning fact_sales.
+        """
+        df_customers = self._presentation_table('dim_customer')[['PARTNERID', 'LATITUDE', 'LONGITUDE']]
+        customer_sales = self._aggregate_fact_sales()['customer_sales'].merge(df_customers, on='PARTNERID', how='inner')
+        return build_geo_index(customer_sales, self.config.geo_index_precision)
 
-    def _load_processed_data(self) -> dict:
+    def _build_fact_orders(self) -> pd.DataFrame:
         """
-        Loads all processed Parquet files into a dictionary of pandas DataFrames.
+        Builds fact_orders: one row per sales order with its line count and
+        summed measures, plus per-customer running totals and rolling 30/90-day
+        revenue. Order totals are aggregated batch by batch from fact_sales;
+        the window columns are only recomputed for customers whose orders
+        changed since the published snapshot.
         """
-        dataframes = {}
-        path = self.config.processed_data_path
-        for file_name in os.listdir(path):
-            if file_name.endswith('.parquet'):
-                table_name = Path(file_name).stem
-                dataframes[table_name] = pd.read_parquet(os.path.join(path, file_name))
-        logger.info(f"Loaded {len(dataframes)} processed tables.")
-        return dataframes
+        orders = self._aggregate_fact_sales()['order_totals']
+        return update_order_windows(orders, self._load_published_table('fact_orders'))
+
+    def _build_customer_metrics(self) -> pd.DataFrame:
+        """
+        Builds customer_metrics: recency, frequency and monetary value (RFM)
+        with quintile scores, rolling revenue and order value statistics per
+        customer and currency, summarised from fact_orders.
+        """
+        return customer_metrics(self._presentation_table('fact_orders'))
+
+    def _build_text_index(self) -> pd.DataFrame:
+        """
+        Builds text_index: an inverted index from the words of the product and
+        category descriptions (short, medium and long, in every language) and
+        of the product ids to the products they describe, for prefix and fuzzy
+        product search.
+        """
+        return build_text_index(
+            self._load_processed_table('ProductTexts'),
+            self._load_processed_table('ProductCategoryText'),
+            self._load_processed_table('Products')
+        )
+
+    def _build_text_ngrams(self) -> pd.DataFrame:
+        """
+        Builds text_ngrams: the character trigrams of every term in text_index,
+        used to find terms similar to a misspelt search word.
+        """
+        return build_ngram_index(self._presentation_table('text_index'))
+
+    def _load_published_table(self, table_name: str) -> pd.DataFrame:
+        """
+        Loads a table of the currently published snapshot, or None if there is
+        no published snapshot or it was built without the table.
+        """
+        pointer = Path(self.config.presentation_path) / "CURRENT"
+        if not pointer.exists():
+            return None
+        path = self.snapshot_path(pointer.read_text().strip()) / f"{table_name}.parquet"
+        return pd.read_parquet(path) if path.exists() else None
+
+    def new_snapshot(self) -> str:
+        """
+        Creates an empty, unpublished snapshot directory and returns its version.
+        """
+        version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        os.makedirs(self.snapshot_path(version))
+        return version
+
+    def snapshot_path(self, version: str) -> Path:
+        """
+        Returns the directory of a snapshot version.
+        """
+        return Path(self.config.presentation_path) / "versions" / version
+
+    def build_table(self, table_name: str, version: str):
+        """
+        Builds one presentation table and writes it into an unpublished snapshot.
+        Each table is written atomically, so a retried build never leaves a partial file.
+        """
+        if table_name not in self.PRESENTATION_TABLES:
+            raise ValueError(f"Unknown presentation table: {table_name}")
+        output_path = self.snapshot_path(version) / f"{table_name}.parquet"
+
+        with self.memory.track(f"build {table_name}"):
+            # In out-of-core mode SalesOrderItems stays on disk and is streamed into fact_sales
+            if table_name == 'fact_sales' and self.modelling_mode == 'out_of_core':
+                self._stream_fact_sales(output_path)
+                return
+            df = self._presentation_table(table_name)
+            save_parquet(df, output_path, self.config.storage, table_name)
+
+    def publish_snapshot(self, version: str):
+        """
+        Publishes a fully built snapshot and applies the retention policy.
+        """
+        self._publish_snapshot(version)
+        self._remove_old_snapshots(version)
+
+    def discard_snapshot(self, version: str):
+        """
+        Deletes an unpublished snapshot. It is never read, so it is simply removed.
+        """
+        shutil.rmtree(self.snapshot_path(version), ignore_errors=True)
+
+    def _publish_snapshot(self, version: str):
+        """
+        Atomically points presentation_path/CURRENT at a fully written snapshot.
+        The pointer is written to a temporary file and swapped in with os.replace,
+        so readers see either the previous version or the new one, never a mix.
+        """
+        presentation_path = Path(self.config.presentation_path)
+        pointer_tmp = presentation_path / f"CURRENT.{version}.tmp"
+        with open(pointer_tmp, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        check_write_fence()
+        os.replace(pointer_tmp, presentation_path / "CURRENT")
+        logger.info(f"Published presentation snapshot '{version}'")
+
+    def _remove_old_snapshots(self, current_version: str):
+        """
+        Deletes snapshots beyond the retention count, oldest first.
+        The published version is always kept, so a retention of 0 keeps only it.
+        """
+        versions_dir = Path(self.config.presentation_path) / "versions"
+        versions = sorted(p.name for p in versions_dir.iterdir() if p.is_dir())
+        cutoff = max(len(versions) - self.config.snapshot_retention, 0)
+        expired = [v for v in versions[:cutoff] if v != current_version]
+        for version in expired:
+            shutil.rmtree(versions_dir / version, ignore_errors=True)
+            logger.info(f"Removed presentation snapshot '{version}' (retention: {self.config.snapshot_retention})")
 
     def build_star_schema(self):
         """
         Builds the fact and dimension tables for the star schema.
+        Each run writes a new snapshot under presentation_path/versions and only
+        publishes it once every table has been written.
         """
+        version = self.new_snapshot()
         try:
             logger.info("Starting the data modelling process to build the star schema.")
-            df_dict = self._load_processed_data()
-
-            # --- 1. Build dim_customer ---
-            df_partners = df_dict['BusinessPartners']
-            df_addresses = df_dict['Addresses']
-            dim_customer = pd.merge(df_partners, df_addresses, on='ADDRESSID', how='left')
-            
-            # --- 2. Build dim_product ---
-            df_products = df_dict['Products']
-            df_prod_cat_text = df_dict['ProductCategoryText']
-            df_prod_text = df_dict['ProductTexts']
-            
-            df_prod_cat_text = df_prod_cat_text[df_prod_cat_text['LANGUAGE'] == 'EN']
-            df_prod_text = df_prod_text[df_prod_text['LANGUAGE'] == 'EN']
-            
-            dim_product_intermediate = pd.merge(df_products, df_prod_cat_text, on='PRODCATEGORYID', how='left')
-            dim_product = pd.merge(dim_product_intermediate, df_prod_text, on='PRODUCTID', how='left')
-
-            # --- 3. Build dim_employee ---
-            dim_employee = df_dict['Employees']
-
-            # --- 4. Build dim_date ---
-            df_sales_orders = df_dict['SalesOrders']
-            df_sales_orders['CREATEDAT'] = pd.to_datetime(df_sales_orders['CREATEDAT'])
-            min_date = df_sales_orders['CREATEDAT'].min()
-            max_date = df_sales_orders['CREATEDAT'].max()
-            
-            dim_date = pd.DataFrame({'Date': pd.date_range(min_date, max_date)})
-            dim_date['Year'] = dim_date['Date'].dt.year
-            dim_date['Month'] = dim_date['Date'].dt.month
-            dim_date['Day'] = dim_date['Date'].dt.day
-            dim_date['Quarter'] = dim_date['Date'].dt.quarter
-            dim_date['DayOfWeek'] = dim_date['Date'].dt.dayofweek # Monday=0, Sunday=6
-
-            # --- 5. Build fact_sales (Further enriched with your suggestion) ---
-            df_sales_items = df_dict['SalesOrderItems']
-            
-            # Select columns to enrich the fact table from the main order table
-            order_details = df_sales_orders[[
-                'SALESORDERID', 'PARTNERID', 'CREATEDBY', 
-                'CREATEDAT', 'BILLINGSTATUS', 'DELIVERYSTATUS', 'LIFECYCLESTATUS'
-            ]]
-            
-            fact_sales = pd.merge(df_sales_items, order_details, on='SALESORDERID', how='left')
-            
-            # Rename columns for clarity in the final model
-            fact_sales.rename(columns={
-                'CREATEDAT': 'OrderDate', 
-                'CREATEDBY': 'EMPLOYEEID',
-                'BILLINGSTATUS': 'BillingStatus',
-                'DELIVERYSTATUS': 'DeliveryStatus',
-                'LIFECYCLESTATUS': 'LifecycleStatus'
-            }, inplace=True)
-            
-            # --- 6. Save Presentation Tables ---
-            presentation_path = self.config.presentation_path
-            dim_customer.to_parquet(os.path.join(presentation_path, "dim_customer.parquet"), index=False)
-            dim_product.to_parquet(os.path.join(presentation_path, "dim_product.parquet"), index=False)
-            dim_employee.to_parquet(os.path.join(presentation_path, "dim_employee.parquet"), index=False)
-            dim_date.to_parquet(os.path.join(presentation_path, "dim_date.parquet"), index=False)
-            fact_sales.to_parquet(os.path.join(presentation_path, "fact_sales.parquet"), index=False)
-            
-            logger.info(f"Successfully built and saved star schema tables to '{presentation_path}'")
+            for table_name in self.PRESENTATION_TABLES:
+                self.build_table(table_name, version)
+
+            self.publish_snapshot(version)
+            logger.info(f"Successfully built and saved star schema tables to '{self.snapshot_path(version)}'")
 
         except Exception as e:
+            self.discard_snapshot(version)
             logger.error(f"An error occurred during data modelling: {e}")
             raise e
@@ -1,9 +1,18 @@
 import os
+import csv
+import itertools
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from pathlib import Path
 from src.logger_config import logger
 from src.entity.config_entity import DataTransformationConfig
-from src.utils import read_yaml
+from src.utils import read_yaml, save_parquet, open_parquet_writer, write_parquet_batch
+from src.components.deduplication import KeyDeduplicator, KeySet
+from src.components.quarantine import QuarantineWriter
+from src.components.memory_budget import MemoryBudget, format_bytes
+from src.components.coordination import check_write_fence
 
 class DataTransformation:
     def __init__(self, config: DataTransformationConfig):
@@ -11,90 +20,306 @@ class DataTransformation:
         Initializes the DataTransformation component with its configuration
         and loads the data schema.
         """
+        if config.bad_rows not in self.BAD_ROW_POLICIES:
+            raise ValueError(f"Unknown bad_rows policy '{config.bad_rows}', expected one of {self.BAD_ROW_POLICIES}")
         self.config = config
         self.schema = read_yaml(Path("schema.yaml"))
+        self.memory = MemoryBudget(config.memory)
 
-    def _clean_and_transform(self, df: pd.DataFrame, file_schema: dict, file_name: str) -> pd.DataFrame:
+    # Schema type names mapped to Arrow-backed strings and nullable numeric dtypes
+    DTYPE_MAP = {
+        'str': pd.StringDtype("pyarrow"),
+        'float64': 'Float64',
+        'int64': 'Int64'
+    }
+
+    # Ways to handle rows that cannot be parsed or typed (data_transformation.bad_rows)
+    BAD_ROW_POLICIES = ('quarantine', 'coerce', 'fail')
+
+    def _read_header(self, csv_path: Path) -> tuple:
+        """
+        Private helper method to detect a raw CSV file's encoding and read its
+        header. Files starting with a UTF-8 byte order mark are UTF-8; all
+        other files are decoded as latin1.
+
+        Returns:
+            tuple: (encoding, header) with the column names as written in the file.
+        """
+        with open(csv_path, 'rb') as f:
+            has_bom = f.read(3) == b'\xef\xbb\xbf'
+        encoding = 'utf-8-sig' if has_bom else 'latin1'
+
+        with open(csv_path, encoding=encoding, newline='') as f:
+            header = next(csv.reader(f), [])
+        return encoding, header
+
+    def _read_csv(self, csv_path: Path, chunk_rows: int = 0, quarantine: QuarantineWriter = None):
+        """
+        Private helper method to read a raw CSV file with every column as an
+        Arrow-backed string, using pyarrow's streaming CSV reader.
+
+        Rows with the wrong number of fields are skipped by the parser instead
+        of failing the file; they go to the quarantine with reason
+        'MALFORMED_ROW' and their raw text.
+
+        Yields the whole file as one DataFrame, or successive chunks of about
+        'chunk_rows' rows. The index is the row's position in the file (0 is
+        the first data row), also for rows after a malformed one.
+        """
+        encoding, header = self._read_header(csv_path)
+
+        malformed = []
+        def skip_malformed(row):
+            # row.number counts the header as row 1
+            malformed.append((row.number - 2, row.text))
+            return 'skip'
+
+        reader = pa_csv.open_csv(
+            csv_path,
+            # Arrow skips the UTF-8 byte order mark itself
+            read_options=pa_csv.ReadOptions(encoding='utf8' if encoding == 'utf-8-sig' else encoding, use_threads=False),
+            parse_options=pa_csv.ParseOptions(invalid_row_handler=skip_malformed),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={col: pa.string() for col in header}, strings_can_be_null=True
+            )
+        )
+
+        batches, batch_rows, parsed_rows = [], 0, 0
+        skipped_positions = np.empty(0, dtype=np.int64)
+        for batch in itertools.chain(reader, [None]):
+            if batch is not None:
+                batches.append(batch)
+                batch_rows += batch.num_rows
+                if not chunk_rows or batch_rows < chunk_rows:
+                    continue
+
+            if malformed:
+                if self.config.bad_rows == 'fail':
+                    raise ValueError(f"Malformed row {malformed[0][0]} in {csv_path}: {malformed[0][1]!r}")
+                positions, texts = zip(*malformed)
+                skipped_positions = np.sort(np.concatenate([skipped_positions, positions]))
+                if quarantine is not None:
+                    quarantine.add(pd.DataFrame(index=list(positions)), 'MALFORMED_ROW', detail=list(texts))
+                malformed.clear()
+
+            # The last chunk is only yielded if it has rows, or if the file has none
+            if batch is None and not batches and parsed_rows:
+                break
+
+            df = pa.Table.from_batches(batches, schema=reader.schema).to_pandas(
+                types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get
+            )
+            df.columns = df.columns.str.strip()
+
+            # Position in the file of each parsed row, counting the skipped ones
+            ordinals = np.arange(parsed_rows, parsed_rows + len(df))
+            skipped_before = np.searchsorted(skipped_positions - np.arange(len(skipped_positions)), ordinals, side='right')
+            df.index = ordinals + skipped_before
+            parsed_rows += len(df)
+            batches, batch_rows = [], 0
+            yield df
+
+    def _key_deduplicator(self, file_name: str, chunked: bool):
+        """
+        Private helper method returning the deduplicator for a table's primary
+        key from schema.yaml, or None if the table has no key. Chunked runs keep
+        the seen keys in an on-disk key set, cleared at the start of each run.
+        """
+        primary_key = self.schema.get('PRIMARY_KEYS', {}).get(file_name)
+        if not primary_key:
+            return None
+        key_columns = list(primary_key) if isinstance(primary_key, (list, tuple)) else [primary_key]
+
+        key_set = KeySet(Path(self.config.key_store_path) / file_name) if chunked else KeySet()
+        key_set.clear()
+        return KeyDeduplicator(key_columns, key_set)
+
+    def _parse_dates(self, values: pd.Series) -> pd.Series:
+        """
+        Private helper method that parses YYYYMMDD strings into datetime64[us].
+        The dates are computed with numpy at an explicit resolution, so the
+        result does not depend on the pandas version: far-future sentinels such
+        as 99991231 are valid dates instead of overflowing nanoseconds. Values
+        that are not a calendar date become NaT.
+        """
+        digits = values.where(values.str.fullmatch(r'[0-9]{8}', na=False))
+        numbers = pd.to_numeric(digits, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        valid = ~np.isnan(numbers)
+        numbers = np.where(valid, numbers, 19700101).astype('int64')
+        year, month, day = numbers // 10000, numbers // 100 % 100, numbers % 100
+        valid &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1)
+
+        month_start = ((year - 1970) * 12 + np.clip(month, 1, 12) - 1).astype('datetime64[M]').astype('datetime64[D]')
+        next_month = ((year - 1970) * 12 + np.clip(month, 1, 12)).astype('datetime64[M]').astype('datetime64[D]')
+        valid &= day <= (next_month - month_start).astype('int64')
+
+        dates = (month_start + (day - 1)).astype('datetime64[us]')
+        dates[~valid] = np.datetime64('NaT')
+        return pd.Series(dates, index=values.index)
+
+    def _clean_and_transform(self, df: pd.DataFrame, file_schema: dict, file_name: str, quarantine: QuarantineWriter = None) -> pd.DataFrame:
         """
         Private helper method to apply cleaning and transformations to a dataframe.
+
+        Values that do not parse as their schema type (dates as YYYYMMDD,
+        numbers, whole numbers for int64) are detected with vectorised masks.
+        Depending on data_transformation.bad_rows, their rows are moved to the
+        quarantine with reason 'INVALID_DATE' or 'INVALID_NUMBER' and the
+        failing columns, the values are set to null ('coerce'), or the file fails.
         """
         # --- Select only the columns defined in the schema ---
-        df = df[list(file_schema.keys())].copy()
-        
-        # --- Drop Duplicates based on Primary Key defined in schema.yaml ---
-        primary_keys_config = self.schema.get('PRIMARY_KEYS', {})
-        primary_key = primary_keys_config.get(file_name)
-        
-        if primary_key:
-            subset = primary_key if isinstance(primary_key, list) else [primary_key]
-            initial_rows = len(df)
-            df.drop_duplicates(subset=subset, keep='first', inplace=True)
-            final_rows = len(df)
-            if initial_rows > final_rows:
-                logger.info(f"Dropped {initial_rows - final_rows} duplicate rows from {file_name} based on key(s): {subset}")
+        raw = df[list(file_schema.keys())]
+        df = raw.copy()
 
         # --- Enforce Data Types based on schema.yaml ---
+        # Strings are trimmed and whitespace-only values become real nulls, column by column
+        invalid_dates = {}
+        invalid_numbers = {}
         for col, dtype in file_schema.items():
-            if col in df.columns:
-                # --- ROBUST FIX: Check if column name ENDS with 'date' or 'at' ---
-                if col.lower().endswith('date') or col.lower().endswith('at'):
-                    df[col] = pd.to_datetime(df[col], format='%Y%m%d', errors='coerce')
-                else:
-                    df[col] = df[col].astype(dtype, errors='ignore')
-        
-        # --- NEW: Convert whitespace-only strings to proper null values ---
-        # This will fix issues like the NOTEID column.
-        df = df.replace(r'^\s*$', pd.NA, regex=True)
+            values = df[col].str.strip()
+            values = values.mask(values == '')
+
+            # --- ROBUST FIX: Check if column name ENDS with 'date' or 'at' ---
+            if col.lower().endswith('date') or col.lower().endswith('at'):
+                df[col] = self._parse_dates(values)
+                invalid_dates[col] = values.notna() & df[col].isna()
+            elif dtype in ('float64', 'int64'):
+                numbers = pd.to_numeric(values, errors='coerce')
+                invalid = values.notna() & numbers.isna()
+                if dtype == 'int64':
+                    invalid |= numbers.notna() & (numbers % 1 != 0)
+                invalid_numbers[col] = invalid
+                df[col] = numbers.mask(invalid).astype(self.DTYPE_MAP[dtype])
+            else:
+                df[col] = values.astype(self.DTYPE_MAP.get(dtype, self.DTYPE_MAP['str']))
+
+        # --- Divert rows with values that failed typing ---
+        invalid = pd.DataFrame({**invalid_dates, **invalid_numbers}, index=df.index, dtype=bool)
+        bad_rows = invalid.any(axis=1)
+        if bad_rows.any() and self.config.bad_rows != 'coerce':
+            bad = invalid[bad_rows]
+            if self.config.bad_rows == 'fail':
+                raise ValueError(f"{bad_rows.sum()} rows of {file_name} failed typing in columns {list(bad.columns[bad.any()])}")
+            reasons = np.where(bad[list(invalid_dates)].any(axis=1), 'INVALID_DATE', 'INVALID_NUMBER')
+            failing_columns = bad.dot(bad.columns + ',').str.rstrip(',')
+            if quarantine is not None:
+                quarantine.add(raw[bad_rows], reasons, detail=failing_columns)
+            df = df[~bad_rows]
 
         # --- Handle Missing Values ---
-        for col in df.select_dtypes(include=['number']).columns:
-            df[col] = df[col].fillna(0)
-        for col in df.select_dtypes(include=['object', 'string']).columns:
-            df[col] = df[col].fillna('N/A')
+        # Nulls are kept unless schema.yaml defines a fill value for the column
+        fill_values = self.schema.get('FILL_VALUES', {}).get(file_name) or {}
+        for col, value in fill_values.items():
+            if col in df.columns:
+                df[col] = df[col].fillna(value)
             
         return df
 
+    def list_csv_files(self) -> list:
+        """
+        Returns the raw CSV files that have a schema defined in schema.yaml.
+        """
+        all_csv_files = [f for f in os.listdir(self.config.data_path) if f.endswith('.csv')]
+        logger.info(f"Found {len(all_csv_files)} CSV files to transform.")
+
+        csv_files = []
+        for csv_file in all_csv_files:
+            if Path(csv_file).stem not in self.schema.COLUMNS:
+                logger.warning(f"Schema not defined for {csv_file}. Skipping.")
+                continue
+            csv_files.append(csv_file)
+        return csv_files
+
+    def transform_file(self, csv_file: str) -> bool:
+        """
+        Validates one raw CSV file against its schema, applies the transformations
+        and saves it as a processed Parquet file.
+
+        Returns:
+            bool: False if the file failed schema validation and was skipped.
+        """
+        file_name = Path(csv_file).stem
+        logger.info(f"Processing and validating file: {csv_file}")
+        
+        file_schema = self.schema.COLUMNS[file_name]
+        csv_path = Path(self.config.data_path) / csv_file
+
+        schema_cols = set(file_schema.keys())
+        df_cols = {col.strip() for col in self._read_header(csv_path)[1]}
+        
+        if not schema_cols.issubset(df_cols):
+            missing_cols = schema_cols - df_cols
+            logger.error(f"Schema validation failed for {csv_file}. Missing columns: {missing_cols}")
+            return False
+
+        # A fixed chunk_rows wins; otherwise files that do not fit the memory budget are chunked
+        chunk_rows = self.config.chunk_rows or self.memory.csv_chunk_rows(csv_path)
+        if chunk_rows and not self.config.chunk_rows:
+            logger.info(
+                f"{csv_file} needs about {format_bytes(self.memory.csv_footprint(csv_path))}, over the memory budget; "
+                f"transforming it in chunks of {chunk_rows:,} rows"
+            )
+
+        deduplicator = self._key_deduplicator(file_name, chunked=bool(chunk_rows))
+        quarantine = QuarantineWriter(
+            Path(self.config.quarantine_path) / f"{file_name}.parquet", self.config.storage, list(file_schema.keys())
+        )
+        output_file_path = Path(self.config.output_path) / f"{file_name}.parquet"
+
+        with self.memory.track(f"transform {file_name}"):
+            chunks = self._read_csv(csv_path, chunk_rows, quarantine)
+            if not chunk_rows:
+                df_transformed = self._transform_chunk(next(chunks), file_schema, file_name, deduplicator, quarantine)
+                save_parquet(df_transformed, output_file_path, self.config.storage, file_name)
+            else:
+                # Chunks are streamed to a temporary file that replaces the output once complete
+                tmp_path = output_file_path.with_name(f"{output_file_path.name}.{os.getpid()}.tmp")
+                writer = None
+                for df in chunks:
+                    df_transformed = self._transform_chunk(df, file_schema, file_name, deduplicator, quarantine)
+                    if writer is None:
+                        writer = open_parquet_writer(tmp_path, df_transformed, self.config.storage)
+                    write_parquet_batch(writer, df_transformed, self.config.storage)
+                writer.close()
+                check_write_fence()
+                os.replace(tmp_path, output_file_path)
+
+            quarantine.close()
+        logger.info(f"Successfully transformed and saved {csv_file} to {output_file_path}")
+        return True
+
+    def _transform_chunk(self, df: pd.DataFrame, file_schema: dict, file_name: str,
+                         deduplicator: KeyDeduplicator, quarantine: QuarantineWriter) -> pd.DataFrame:
+        """
+        Private helper method that types a chunk of raw rows, then drops the
+        duplicate keys among the rows that typed correctly.
+        """
+        raw = df[list(file_schema.keys())]
+        df = self._clean_and_transform(raw, file_schema, file_name, quarantine)
+        return self._drop_duplicate_keys(df, raw, deduplicator, quarantine)
+
+    def _drop_duplicate_keys(self, df: pd.DataFrame, raw: pd.DataFrame, deduplicator: KeyDeduplicator,
+                             quarantine: QuarantineWriter) -> pd.DataFrame:
+        """
+        Private helper method that keeps the first row of each primary key and
+        quarantines the raw values of the later ones with reason 'DUPLICATE_KEY'.
+        """
+        if deduplicator is None:
+            return df
+        df, duplicates = deduplicator.deduplicate(df)
+        quarantine.add(raw.loc[duplicates.index], 'DUPLICATE_KEY')
+        return df
+
     def validate_and_transform_data(self):
         """
         Reads all raw CSV files, validates them against the defined schema,
         applies transformations, and saves them as processed Parquet files.
         """
         try:
-            raw_data_path = self.config.data_path
-            processed_data_path = self.config.output_path
-            all_schemas = self.schema.COLUMNS
-
-            all_csv_files = [f for f in os.listdir(raw_data_path) if f.endswith('.csv')]
-            logger.info(f"Found {len(all_csv_files)} CSV files to transform.")
-
-            for csv_file in all_csv_files:
-                file_name = Path(csv_file).stem
-                
-                if file_name not in all_schemas:
-                    logger.warning(f"Schema not defined for {csv_file}. Skipping.")
-                    continue
-
-                logger.info(f"Processing and validating file: {csv_file}")
-                
-                file_schema = all_schemas[file_name]
-                df = pd.read_csv(os.path.join(raw_data_path, csv_file), encoding='latin1')
-                df.columns = df.columns.str.replace('ï»¿', '', regex=False).str.strip()
-
-                schema_cols = set(file_schema.keys())
-                df_cols = set(df.columns)
-                
-                if not schema_cols.issubset(df_cols):
-                    missing_cols = schema_cols - df_cols
-                    logger.error(f"Schema validation failed for {csv_file}. Missing columns: {missing_cols}")
-                    continue
-                
-                # Pass file_name to the helper method
-                df_transformed = self._clean_and_transform(df, file_schema, file_name)
-
-                output_file_path = os.path.join(processed_data_path, f"{file_name}.parquet")
-                df_transformed.to_parquet(output_file_path, index=False)
-                logger.info(f"Successfully transformed and saved {csv_file} to {output_file_path}")
+            skipped = [csv_file for csv_file in self.list_csv_files() if not self.transform_file(csv_file)]
+            if skipped:
+                logger.error(f"Skipped {len(skipped)} files that failed schema validation: {skipped}")
 
         except Exception as e:
             logger.exception(f"An error occurred during data transformation: {e}")
-            raise e
\ No newline at end of file
+            raise e
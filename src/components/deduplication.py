@@ -0,0 +1,172 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+
+def hash_keys(df: pd.DataFrame, key_columns: list) -> np.ndarray:
+    """
+    Hashes the key column(s) of every row into one fixed-width 64-bit key.
+    Composite keys are combined column by column in a vectorised way instead
+    of building Python tuples.
+
+    Note: two distinct keys can share a 64-bit hash with a probability of about
+    n^2 / 2^65 for n keys. KeySet checks every hash match against the key
+    values (see encode_keys), so a collision never drops a row.
+    """
+    return pd.util.hash_pandas_object(df[key_columns], index=False).to_numpy()
+
+
+def encode_keys(df: pd.DataFrame, key_columns: list) -> np.ndarray:
+    """
+    Encodes the key column(s) of every row as fixed-width bytes that are equal
+    exactly when the keys are. Each value ends with a separator, and nulls are
+    encoded as a NUL byte, so neither composite keys nor nulls are ambiguous.
+    """
+    encoded = pd.Series('', index=df.index, dtype='object')
+    for col in key_columns:
+        encoded = encoded + df[col].astype('string').fillna('\x00').astype('object') + '\x1f'
+    return np.asarray(encoded.str.encode('utf-8').to_numpy(), dtype=np.bytes_)
+
+
+class KeySet:
+    def __init__(self, directory: Path = None, bucket_bits: int = 8):
+        """
+        A set of keys, stored as their 64-bit hashes with the encoded key values
+        alongside, split into 2^bucket_bits buckets by the top bits of the hash.
+        Each batch of added keys becomes a new sorted run per bucket; runs are
+        merged once a run is no longer at least twice the size of the next, so a
+        bucket has O(log n) runs and each key is rewritten O(log n) times rather
+        than once per batch. With a directory, runs are .npy files that lookups
+        binary-search through memory maps, so the key set can outgrow memory and
+        be shared across chunks or partitions.
+        """
+        self.directory = Path(directory) if directory else None
+        self.bucket_bits = bucket_bits
+        self._runs = {}
+        self._in_memory_runs = {}
+        self._next_run = 0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def clear(self):
+        """
+        Removes every key, including the on-disk runs.
+        """
+        self._runs = {}
+        self._in_memory_runs = {}
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+
+    def contains(self, hashes: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        """
+        Returns, for each key, whether it is in the set. A hash match only
+        counts if the stored key value is equal as well.
+        """
+        found = np.zeros(len(hashes), dtype=bool)
+        for bucket_id, rows in self._bucket_rows(hashes):
+            for run in self._runs.get(bucket_id, []):
+                run_hashes, run_keys = self._load_run(run)
+                first = np.searchsorted(run_hashes, hashes[rows], side='left')
+                last = np.searchsorted(run_hashes, hashes[rows], side='right')
+                hit = last > first
+                # Usually one stored key per hash; only colliding hashes need a scan
+                match = np.zeros(len(rows), dtype=bool)
+                match[hit] = run_keys[first[hit]] == keys[rows[hit]]
+                for i in np.flatnonzero(hit & ~match & (last - first > 1)):
+                    match[i] = bool((run_keys[first[i]:last[i]] == keys[rows[i]]).any())
+                found[rows] |= match
+        return found
+
+    def add(self, hashes: np.ndarray, keys: np.ndarray):
+        """
+        Adds keys that are not in the set yet, as one new run per bucket.
+        """
+        for bucket_id, rows in self._bucket_rows(hashes):
+            order = rows[np.argsort(hashes[rows], kind='stable')]
+            runs = self._runs.setdefault(bucket_id, [])
+            runs.append(self._save_run(bucket_id, hashes[order], keys[order]))
+            while len(runs) > 1 and runs[-2][1] < 2 * runs[-1][1]:
+                runs.append(self._merge_runs(bucket_id, runs.pop(-2), runs.pop()))
+
+    def _bucket_rows(self, hashes: np.ndarray):
+        """
+        Yields each bucket id with the positions of the hashes that fall into it.
+        """
+        buckets = hashes >> np.uint64(64 - self.bucket_bits)
+        order = np.argsort(buckets, kind='stable')
+        bucket_ids, starts = np.unique(buckets[order], return_index=True)
+        return ((int(bucket_id), rows) for bucket_id, rows in zip(bucket_ids, np.split(order, starts[1:])))
+
+    def _save_run(self, bucket_id: int, hashes: np.ndarray, keys: np.ndarray) -> tuple:
+        """
+        Stores a sorted run and returns its handle: (id, number of keys, bucket id).
+        """
+        run_id = self._next_run
+        self._next_run += 1
+        if not self.directory:
+            self._in_memory_runs[run_id] = (hashes, keys)
+        else:
+            np.save(self.directory / f"{bucket_id:04x}-{run_id:08d}-hashes.npy", hashes)
+            np.save(self.directory / f"{bucket_id:04x}-{run_id:08d}-keys.npy", keys)
+        return run_id, len(hashes), bucket_id
+
+    def _load_run(self, run: tuple) -> tuple:
+        """
+        Returns the sorted hashes of a run and the key values aligned with them.
+        """
+        run_id, _, bucket_id = run
+        if not self.directory:
+            return self._in_memory_runs[run_id]
+        prefix = self.directory / f"{bucket_id:04x}-{run_id:08d}"
+        return np.load(f"{prefix}-hashes.npy", mmap_mode='r'), np.load(f"{prefix}-keys.npy", mmap_mode='r')
+
+    def _merge_runs(self, bucket_id: int, older: tuple, newer: tuple) -> tuple:
+        """
+        Merges two runs of a bucket into one sorted run and deletes them.
+        """
+        parts = [self._load_run(older), self._load_run(newer)]
+        hashes = np.concatenate([part[0] for part in parts])
+        keys = np.concatenate([part[1] for part in parts])
+        order = np.argsort(hashes, kind='stable')
+        merged = self._save_run(bucket_id, hashes[order], keys[order])
+        del parts
+        for run_id, _, _ in (older, newer):
+            if not self.directory:
+                del self._in_memory_runs[run_id]
+                continue
+            for suffix in ("hashes", "keys"):
+                os.remove(self.directory / f"{bucket_id:04x}-{run_id:08d}-{suffix}.npy")
+        return merged
+
+
+class KeyDeduplicator:
+    def __init__(self, key_columns: list, key_set: KeySet = None):
+        """
+        Drops rows whose primary key was already seen, keeping the first occurrence.
+        The same instance can be fed successive chunks of a table; keys seen in
+        earlier chunks are remembered in the key set.
+        """
+        self.key_columns = key_columns
+        self.key_set = key_set or KeySet()
+
+    def deduplicate(self, df: pd.DataFrame) -> tuple:
+        """
+        Splits a chunk into the rows to keep and the duplicate rows. Keys are
+        compared by value, so rows are only dropped for an exact duplicate key.
+
+        Returns:
+            tuple: (kept, duplicates) DataFrames.
+        """
+        hashes = hash_keys(df, self.key_columns)
+        keys = encode_keys(df, self.key_columns)
+
+        # First occurrence of each key within the chunk
+        first_in_chunk = ~pd.Series(keys).duplicated().to_numpy()
+
+        # Keys already seen in earlier chunks
+        keep = first_in_chunk & ~self.key_set.contains(hashes, keys)
+        self.key_set.add(hashes[keep], keys[keep])
+        return df[keep], df[~keep]
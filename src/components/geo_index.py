@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+GEOHASH_ALPHABET = np.frombuffer(b"0123456789bcdefghjkmnpqrstuvwxyz", dtype=np.uint8)
+
+# Mean Earth radius used for radius queries
+EARTH_RADIUS_KM = 6371.0088
+
+
+def geohash_encode(latitude: np.ndarray, longitude: np.ndarray, precision: int) -> np.ndarray:
+    """
+    Encodes coordinates as geohashes of 'precision' characters (at most 12),
+    vectorised over all points. Every geohash of a lower precision is a
+    prefix of this one, so one encoding gives the cells of all coarser zoom
+    levels. Points without coordinates get None.
+
+    Returns:
+        np.ndarray: Geohash strings (object dtype).
+    """
+    if not 1 <= precision <= 12:
+        raise ValueError(f"Geohash precision must be between 1 and 12, got {precision}")
+    latitude = np.asarray(latitude, dtype='float64')
+    longitude = np.asarray(longitude, dtype='float64')
+    valid = np.isfinite(latitude) & np.isfinite(longitude)
+
+    # Geohash bits alternate longitude, latitude, starting with longitude
+    bits = 5 * precision
+    lon_bits, lat_bits = (bits + 1) // 2, bits // 2
+    lon_cells = np.clip(((np.nan_to_num(longitude) + 180) / 360 * 2 ** lon_bits).astype('int64'), 0, 2 ** lon_bits - 1)
+    lat_cells = np.clip(((np.nan_to_num(latitude) + 90) / 180 * 2 ** lat_bits).astype('int64'), 0, 2 ** lat_bits - 1)
+
+    code = np.zeros(len(latitude), dtype='int64')
+    for bit in range(bits):
+        if bit % 2 == 0:
+            value = (lon_cells >> (lon_bits - 1 - bit // 2)) & 1
+        else:
+            value = (lat_cells >> (lat_bits - 1 - bit // 2)) & 1
+        code = (code << 1) | value
+
+    # Five bits per character, most significant first
+    shifts = 5 * np.arange(precision - 1, -1, -1)
+    chars = GEOHASH_ALPHABET[(code[:, None] >> shifts) & 31]
+    geohashes = np.ascontiguousarray(chars).view(f'S{precision}').ravel().astype(str).astype(object)
+    geohashes[~valid] = None
+    return geohashes
+
+
+def geohash_bounds(geohashes: pd.Series) -> pd.DataFrame:
+    """
+    Returns the MIN_LAT, MAX_LAT, MIN_LON and MAX_LON of each geohash cell.
+    """
+    lookup = np.full(256, -1, dtype='int64')
+    lookup[GEOHASH_ALPHABET] = np.arange(32)
+
+    bounds = {'MIN_LAT': [], 'MAX_LAT': [], 'MIN_LON': [], 'MAX_LON': []}
+    index = []
+    # Cells of one precision are decoded together
+    for precision, group in geohashes.groupby(geohashes.str.len()):
+        precision = int(precision)
+        chars = np.frombuffer(''.join(group).encode('ascii'), dtype=np.uint8)
+        values = lookup[chars.reshape(-1, precision)]
+        code = np.zeros(len(group), dtype='int64')
+        for column in range(precision):
+            code = (code << 5) | values[:, column]
+
+        bits = 5 * precision
+        lon_bits, lat_bits = (bits + 1) // 2, bits // 2
+        lon_cells = np.zeros(len(group), dtype='int64')
+        lat_cells = np.zeros(len(group), dtype='int64')
+        for bit in range(bits):
+            value = (code >> (bits - 1 - bit)) & 1
+            if bit % 2 == 0:
+                lon_cells = (lon_cells << 1) | value
+            else:
+                lat_cells = (lat_cells << 1) | value
+
+        lat_size, lon_size = 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+        bounds['MIN_LAT'].append(lat_cells * lat_size - 90)
+        bounds['MAX_LAT'].append((lat_cells + 1) * lat_size - 90)
+        bounds['MIN_LON'].append(lon_cells * lon_size - 180)
+        bounds['MAX_LON'].append((lon_cells + 1) * lon_size - 180)
+        index.append(group.index)
+
+    if not index:
+        return pd.DataFrame({col: pd.Series(dtype='float64') for col in bounds}, index=geohashes.index)
+    return pd.DataFrame({col: np.concatenate(values) for col, values in bounds.items()},
+                        index=np.concatenate(index)).reindex(geohashes.index)
+
+
+class CustomerSalesBuilder:
+    def __init__(self):
+        """
+        Aggregates fact_sales batch by batch into the completed net revenue,
+        quantity and number of orders per customer and currency, the input of
+        build_geo_index. Orders can span batches, so they are counted at the end.
+        """
+        self._partials = []
+        self._partner_orders = []
+
+    def add(self, fact_sales: pd.DataFrame):
+        """
+        Adds one batch of fact_sales rows.
+        """
+        completed = fact_sales[fact_sales['LifecycleStatus'].eq('C').fillna(False)]
+        self._partials.append(completed.groupby(['PARTNERID', 'CURRENCY'], dropna=False).agg(
+            NET_REVENUE=('NETAMOUNT', 'sum'), QUANTITY=('QUANTITY', 'sum')
+        ))
+        self._partner_orders.append(completed[['PARTNERID', 'CURRENCY', 'SALESORDERID']].drop_duplicates())
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns one row per customer and currency with NET_REVENUE, QUANTITY and ORDERS.
+        """
+        orders = pd.concat(self._partner_orders).drop_duplicates().groupby(['PARTNERID', 'CURRENCY'], dropna=False).size()
+        customer_sales = pd.concat(self._partials).groupby(level=[0, 1], dropna=False).sum()
+        customer_sales['ORDERS'] = orders.reindex(customer_sales.index, fill_value=0)
+        return customer_sales.reset_index()
+
+
+def build_geo_index(customer_sales: pd.DataFrame, max_precision: int) -> pd.DataFrame:
+    """
+    Pre-aggregates sales per geohash cell for every zoom level from 1 to
+    'max_precision' characters.
+
+    Args:
+        customer_sales (pd.DataFrame): One row per customer and currency with
+            LATITUDE, LONGITUDE, CURRENCY, NET_REVENUE, ORDERS and QUANTITY.
+        max_precision (int): Finest geohash precision to index.
+
+    Returns:
+        pd.DataFrame: One row per precision, cell and currency with the cell
+        bounds, the revenue-weighted centroid of its customers and the summed
+        measures. CUSTOMERS counts the customers buying in that currency;
+        CELL_CUSTOMERS counts the cell's customers over all currencies, so a
+        customer buying in several currencies is only counted once.
+    """
+    located = customer_sales.dropna(subset=['LATITUDE', 'LONGITUDE'])
+    geohashes = pd.Series(geohash_encode(located['LATITUDE'], located['LONGITUDE'], max_precision), index=located.index)
+
+    # Centroids are weighted by revenue. The epsilon only matters when no customer
+    # of a cell has revenue: the centroid is then their plain mean, not 0 / 0
+    weights = located['NET_REVENUE'].clip(lower=0).fillna(0) + 1e-9
+    levels = []
+    for precision in range(1, max_precision + 1):
+        cells = located.assign(
+            GEOHASH=geohashes.str[:precision], W=weights,
+            WLAT=located['LATITUDE'] * weights, WLON=located['LONGITUDE'] * weights
+        ).groupby(['GEOHASH', 'CURRENCY'], dropna=False, sort=True).agg(
+            NET_REVENUE=('NET_REVENUE', 'sum'), ORDERS=('ORDERS', 'sum'), QUANTITY=('QUANTITY', 'sum'),
+            CUSTOMERS=('PARTNERID', 'nunique'), W=('W', 'sum'), WLAT=('WLAT', 'sum'), WLON=('WLON', 'sum')
+        ).reset_index()
+        cell_customers = located.groupby(geohashes.str[:precision])['PARTNERID'].nunique()
+        cells['CELL_CUSTOMERS'] = cells['GEOHASH'].map(cell_customers)
+        cells.insert(0, 'PRECISION', precision)
+        cells['LATITUDE'] = cells['WLAT'] / cells['W']
+        cells['LONGITUDE'] = cells['WLON'] / cells['W']
+        levels.append(cells.drop(columns=['W', 'WLAT', 'WLON']))
+
+    geo_index = pd.concat(levels, ignore_index=True)
+    geo_index = pd.concat([geo_index, geohash_bounds(geo_index['GEOHASH'])], axis=1)
+    return geo_index.astype({
+        'PRECISION': 'int8', 'GEOHASH': pd.StringDtype("pyarrow"), 'CURRENCY': pd.StringDtype("pyarrow"),
+        'ORDERS': 'int64', 'QUANTITY': 'int64', 'CUSTOMERS': 'int64', 'CELL_CUSTOMERS': 'int64'
+    })
+
+
+class GeoIndex:
+    def __init__(self, geo_index: pd.DataFrame):
+        """
+        Answers map, bounding-box and radius queries from the pre-aggregated
+        geo_index table without touching fact_sales. Results are at cell
+        resolution: a cell is included when its customers' centroid falls
+        inside the area, so choose a precision fine enough for the area queried.
+        """
+        self.cells = geo_index
+        self.max_precision = int(geo_index['PRECISION'].max()) if len(geo_index) else 0
+
+    def level(self, precision: int) -> pd.DataFrame:
+        """
+        Returns the cells of one zoom level.
+        """
+        return self.cells[self.cells['PRECISION'] == min(precision, self.max_precision)]
+
+    def within_bbox(self, precision: int, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> pd.DataFrame:
+        """
+        Returns the cells whose centroid lies in the bounding box. A box with
+        min_lon > max_lon crosses the antimeridian.
+        """
+        cells = self.level(precision)
+        in_lat = cells['LATITUDE'].between(min_lat, max_lat)
+        if min_lon <= max_lon:
+            in_lon = cells['LONGITUDE'].between(min_lon, max_lon)
+        else:
+            in_lon = (cells['LONGITUDE'] >= min_lon) | (cells['LONGITUDE'] <= max_lon)
+        return cells[in_lat & in_lon]
+
+    def within_radius(self, precision: int, latitude: float, longitude: float, radius_km: float) -> pd.DataFrame:
+        """
+        Returns the cells whose centroid lies within 'radius_km' of a point
+        (great-circle distance), with the distance in DISTANCE_KM.
+        """
+        cells = self.level(precision)
+        lat1, lon1 = np.radians(latitude), np.radians(longitude)
+        lat2, lon2 = np.radians(cells['LATITUDE'].to_numpy()), np.radians(cells['LONGITUDE'].to_numpy())
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+        return cells.assign(DISTANCE_KM=distance)[distance <= radius_km]
@@ -0,0 +1,212 @@
+import math
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pathlib import Path
+from src.logger_config import logger
+from src.components.memory_budget import MemoryBudget, format_bytes
+
+
+class KeyIndex:
+    def __init__(self, df: pd.DataFrame, key):
+        """
+        Builds a lookup index over the key column(s) of one side of a join.
+        The index is built once and can be reused by every join against the
+        same table, instead of re-hashing the keys on each pd.merge.
+        """
+        self.df = df
+        self.key = key if isinstance(key, list) else [key]
+        if len(self.key) == 1:
+            self.index = pd.Index(df[self.key[0]])
+        else:
+            self.index = pd.MultiIndex.from_frame(df[self.key])
+        self.is_unique = self.index.is_unique
+
+    def positions(self, left: pd.DataFrame) -> np.ndarray:
+        """
+        Returns the row position of each left key in the indexed table,
+        or -1 where the key has no match.
+        """
+        if len(self.key) == 1:
+            return self.index.get_indexer(left[self.key[0]])
+        return self.index.get_indexer(pd.MultiIndex.from_frame(left[self.key]))
+
+
+class JoinEngine:
+    def __init__(self, engine: str = "hash", spill_dir: Path = None, partitions: int = 16, spill: str = "auto",
+                 memory: MemoryBudget = None):
+        """
+        Initializes the join engine used to build the star schema.
+
+        Args:
+            engine (str): 'hash' joins through reusable KeyIndex lookups,
+                'pandas' falls back to pd.merge.
+            spill_dir (Path): Directory for partition files of spilled joins.
+            partitions (int): Least number of hash partitions for spilled joins;
+                more are used when a partition pair would not fit the memory budget.
+            spill (str): When joins streamed from Parquet files go through disk:
+                'auto' when their right side does not fit the memory budget,
+                'always' or 'never'.
+            memory (MemoryBudget): The memory budget; without one, 'auto' never spills.
+        """
+        if engine not in ("hash", "pandas"):
+            raise ValueError(f"Unknown join engine: {engine}")
+        if spill not in ("auto", "always", "never"):
+            raise ValueError(f"Unknown join spill mode: {spill}")
+        self.engine = engine
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.partitions = partitions
+        self.spill = spill
+        self.memory = memory
+        self._indexes = {}
+
+    def index(self, name: str, df: pd.DataFrame, key) -> KeyIndex:
+        """
+        Returns the cached KeyIndex for a table, building it on first use
+        or when a different DataFrame is passed under the same name.
+        """
+        cache_key = (name, tuple(key) if isinstance(key, list) else key)
+        cached = self._indexes.get(cache_key)
+        if cached is None or cached.df is not df:
+            cached = KeyIndex(df, key)
+            self._indexes[cache_key] = cached
+        return cached
+
+    def left_join(self, left: pd.DataFrame, right: pd.DataFrame, on, columns: list = None, rename: dict = None, right_name: str = None) -> pd.DataFrame:
+        """
+        Left-joins the projected right columns onto the left DataFrame.
+        Only the key(s) and the requested columns of the right side are used,
+        so no '_x'/'_y' duplicates are produced.
+
+        Args:
+            left (pd.DataFrame): Left side; its row order is preserved.
+            right (pd.DataFrame): Right side.
+            on (str | list): Join key column(s), present on both sides.
+            columns (list, optional): Right columns to bring in. Defaults to all non-key columns.
+            rename (dict, optional): Renames applied to the projected right columns.
+            right_name (str, optional): Name under which the right key index is cached.
+        """
+        keys = on if isinstance(on, list) else [on]
+        if columns is None:
+            columns = [col for col in right.columns if col not in keys]
+        rename = rename or {}
+
+        overlapping = {rename.get(col, col) for col in columns} & (set(left.columns) - set(keys))
+        if overlapping:
+            raise ValueError(f"Right columns {sorted(overlapping)} already exist on the left side. Use 'rename' to disambiguate.")
+
+        if self.engine == "pandas":
+            return self._merge(left, right, keys, columns, rename)
+
+        key_index = self.index(right_name, right, keys) if right_name else KeyIndex(right, keys)
+        if not key_index.is_unique:
+            logger.warning(f"Join keys {keys} are not unique in '{right_name}'. Falling back to pd.merge.")
+            return self._merge(left, right, keys, columns, rename)
+
+        return self._hash_left_join(left, key_index, columns, rename)
+
+    def _merge(self, left: pd.DataFrame, right: pd.DataFrame, keys: list, columns: list, rename: dict) -> pd.DataFrame:
+        """
+        Private helper method for the pandas fallback on the projected right side.
+        """
+        projected = right[keys + columns].rename(columns=rename)
+        return pd.merge(left, projected, on=keys, how='left')
+
+    def _hash_left_join(self, left: pd.DataFrame, key_index: KeyIndex, columns: list, rename: dict) -> pd.DataFrame:
+        """
+        Private helper method that gathers the right columns by position.
+        Unmatched rows receive nulls, as with a pandas left merge.
+        """
+        positions = key_index.positions(left)
+        joined = {
+            rename.get(col, col): pd.api.extensions.take(key_index.df[col].array, positions, allow_fill=True)
+            for col in columns
+        }
+        return pd.concat([left.reset_index(drop=True), pd.DataFrame(joined)], axis=1)
+
+    def left_join_files(self, left_path: Path, right_path: Path, on, columns: list, rename: dict = None,
+                        batch_rows: int = 1_000_000, right_name: str = None):
+        """
+        Left-joins two Parquet files without loading the left side, yielding
+        the joined rows batch by batch. If the projected right side fits the
+        memory budget, it is loaded once and each left batch is joined as it
+        is scanned, in file order. Otherwise both sides are hash-partitioned
+        to disk and joined one partition pair at a time, so only one pair is
+        resident; rows then come out partition by partition.
+
+        Args:
+            left_path (Path): Left side; scanned in batches of 'batch_rows'.
+            right_path (Path): Right side; only the key(s) and 'columns' are read.
+            on, columns, rename, right_name: As for left_join.
+
+        Yields:
+            pd.DataFrame: Joined batches.
+        """
+        keys = on if isinstance(on, list) else [on]
+        right_columns = keys + columns
+        right_bytes = self.memory.parquet_footprint(right_path, right_columns) if self.memory else 0
+        spill = self.spill == "always" or (self.spill == "auto" and self.memory is not None and not self.memory.fits(2 * right_bytes))
+        if not spill:
+            right = pd.read_parquet(right_path, columns=right_columns)
+            scanner = ds.dataset(left_path, format="parquet").scanner(batch_size=batch_rows)
+            for batch in scanner.to_batches():
+                if batch.num_rows > 0:
+                    yield self.left_join(batch.to_pandas(), right, keys, columns, rename, right_name)
+            return
+
+        # Each partition pair should take at most half the budget once loaded
+        partitions = self.partitions
+        if self.memory:
+            left_bytes = self.memory.parquet_footprint(left_path)
+            partitions = max(partitions, math.ceil(2 * (left_bytes + right_bytes) / self.memory.budget_bytes))
+        spill_root = Path(tempfile.mkdtemp(dir=self.spill_dir))
+        logger.info(
+            f"Spilling join of {Path(left_path).name} and {Path(right_path).name} "
+            f"({format_bytes(right_bytes)} right side) into {partitions} partitions under {spill_root}"
+        )
+        try:
+            self._spill_partitions(left_path, None, keys, partitions, spill_root / "left", batch_rows)
+            right_schema = self._spill_partitions(right_path, right_columns, keys, partitions, spill_root / "right", batch_rows)
+            for p in range(partitions):
+                left_file, right_file = spill_root / f"left_{p}.parquet", spill_root / f"right_{p}.parquet"
+                if not left_file.exists():
+                    continue
+                right_part = pd.read_parquet(right_file) if right_file.exists() else right_schema.empty_table().to_pandas()
+                yield self.left_join(pd.read_parquet(left_file), right_part, keys, columns, rename)
+        finally:
+            shutil.rmtree(spill_root, ignore_errors=True)
+
+    def _spill_partitions(self, path: Path, columns: list, key: list, partitions: int, prefix: Path, batch_rows: int) -> pa.Schema:
+        """
+        Private helper method that hash-partitions a Parquet file on its key,
+        batch by batch, into one file per non-empty partition.
+
+        Returns:
+            pa.Schema: The schema of the partition files.
+        """
+        scanner = ds.dataset(path, format="parquet").scanner(columns=columns, batch_size=batch_rows)
+        writers = {}
+        try:
+            for batch in scanner.to_batches():
+                if batch.num_rows == 0:
+                    continue
+                partition = self._partition_of(batch.select(key).to_pandas(), key)
+                for p in np.unique(partition):
+                    if p not in writers:
+                        writers[p] = pq.ParquetWriter(f"{prefix}_{p}.parquet", scanner.projected_schema)
+                    writers[p].write_batch(batch.filter(pa.array(partition == p)))
+        finally:
+            for writer in writers.values():
+                writer.close()
+        return scanner.projected_schema
+
+    def _partition_of(self, df: pd.DataFrame, key: list) -> np.ndarray:
+        """
+        Private helper method that assigns each row to a hash partition of its key.
+        """
+        hashes = pd.util.hash_pandas_object(df[key], index=False).to_numpy()
+        return hashes % np.uint64(self.partitions)
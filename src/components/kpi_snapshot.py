@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+# Sales channel of each business partner role, as shown in the dashboard
+PARTNER_ROLE_CHANNELS = {'1': 'Reseller', '2': 'Direct Customer'}
+
+# Series stored in the snapshot that are amounts in the sales' own currencies
+AMOUNT_SERIES = ('revenue', 'category', 'channel', 'daily', 'customer')
+
+
+def conversion_factors(currencies: pd.Series, rates: dict, target: str) -> np.ndarray:
+    """
+    Returns, for each row, the factor converting an amount from the row's
+    currency into 'target'. Currencies without a rate count as 1, and a zero
+    source rate converts to 0, as in the dashboard.
+    """
+    from_rates = currencies.map({c: rates.get(c, 1) for c in currencies.dropna().unique()}).fillna(1).to_numpy(dtype='float64')
+    to_rate = rates.get(target, 1)
+    with np.errstate(divide='ignore'):
+        return np.where(from_rates == 0, 0.0, to_rate / from_rates)
+
+
+class KpiSnapshotBuilder:
+    def __init__(self, dim_customer: pd.DataFrame, dim_product: pd.DataFrame, dim_employee: pd.DataFrame):
+        """
+        Aggregates fact_sales batch by batch into the dashboard's default view:
+        every filter at its default (all dates, employees, companies, countries,
+        categories and channels). Like the dashboard's joins and filters, this
+        keeps the sales whose customer, employee (with a full name) and product
+        category are known. Amounts are summed per original currency, so the
+        dashboard can convert them to any currency with live rates.
+        """
+        self.customers = dim_customer[['PARTNERID', 'COMPANYNAME']].assign(
+            Channel=dim_customer['PARTNERROLE'].map(PARTNER_ROLE_CHANNELS).fillna('Unknown')
+        ).set_index('PARTNERID')
+        named = (dim_employee['NAME_FIRST'] + ' ' + dim_employee['NAME_LAST']).notna()
+        self.employee_ids = dim_employee.loc[named, 'EMPLOYEEID']
+        self.categories = dim_product.dropna(subset=['CATEGORY_SHORT_DESCR']).set_index('PRODUCTID')['CATEGORY_SHORT_DESCR']
+
+        self._partials = []
+        self._completed_orders = []
+        self._status_orders = []
+
+    def add(self, fact_sales: pd.DataFrame):
+        """
+        Adds one batch of fact_sales rows.
+        """
+        in_view = (
+            fact_sales['PARTNERID'].isin(self.customers.index)
+            & fact_sales['EMPLOYEEID'].isin(self.employee_ids)
+            & fact_sales['PRODUCTID'].isin(self.categories.index)
+            & fact_sales['OrderDate'].notna()
+        )
+        sales = fact_sales[in_view]
+        completed = sales[sales['LifecycleStatus'].eq('C').fillna(False)]
+
+        labels = {
+            'revenue': pd.Series('', index=completed.index),
+            'category': completed['PRODUCTID'].map(self.categories),
+            'channel': completed['PARTNERID'].map(self.customers['Channel']),
+            'daily': completed['OrderDate'].dt.strftime('%Y-%m-%d'),
+            'customer': completed['PARTNERID'].map(self.customers['COMPANYNAME']).fillna('Unknown')
+        }
+        for series, label in labels.items():
+            totals = completed['NETAMOUNT'].groupby([label, completed['CURRENCY']], dropna=False).sum()
+            self._partials.append(pd.DataFrame({
+                'SERIES': series,
+                'LABEL': totals.index.get_level_values(0),
+                'CURRENCY': totals.index.get_level_values(1),
+                'VALUE': totals.to_numpy(dtype='float64')
+            }))
+        self._partials.append(pd.DataFrame({
+            'SERIES': ['quantity'], 'LABEL': [''], 'CURRENCY': [None], 'VALUE': [float(completed['QUANTITY'].sum())]
+        }))
+
+        # Orders span batches, so their ids are kept until the end to count them once
+        self._completed_orders.append(completed['SALESORDERID'].unique())
+        self._status_orders.append(sales[['LifecycleStatus', 'SALESORDERID']].dropna().drop_duplicates())
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the snapshot in long format: SERIES, LABEL, CURRENCY and VALUE.
+        Counts ('orders', 'status') have no currency.
+        """
+        completed_orders = pd.unique(np.concatenate(self._completed_orders)) if self._completed_orders else []
+        status_orders = pd.concat(self._status_orders).drop_duplicates() if self._status_orders else pd.DataFrame(
+            columns=['LifecycleStatus', 'SALESORDERID']
+        )
+        status_counts = status_orders.groupby('LifecycleStatus')['SALESORDERID'].size()
+
+        snapshot = pd.concat([
+            *self._partials,
+            pd.DataFrame({'SERIES': ['orders'], 'LABEL': [''], 'CURRENCY': [None], 'VALUE': [float(len(completed_orders))]}),
+            pd.DataFrame({'SERIES': 'status', 'LABEL': status_counts.index, 'CURRENCY': None, 'VALUE': status_counts.to_numpy(dtype='float64')})
+        ], ignore_index=True)
+        snapshot = snapshot.astype({'SERIES': pd.StringDtype("pyarrow"), 'LABEL': pd.StringDtype("pyarrow"), 'CURRENCY': pd.StringDtype("pyarrow")})
+        return snapshot.groupby(['SERIES', 'LABEL', 'CURRENCY'], dropna=False, sort=True)['VALUE'].sum().reset_index()
+
+
+def snapshot_value(snapshot: pd.DataFrame, series: str, rates: dict = None, target: str = None) -> float:
+    """
+    Returns a single-valued series of the snapshot: a count, or an amount converted to 'target'.
+    """
+    rows = snapshot[snapshot['SERIES'] == series]
+    if series in AMOUNT_SERIES:
+        return float((rows['VALUE'].to_numpy() * conversion_factors(rows['CURRENCY'], rates, target)).sum())
+    return float(rows['VALUE'].sum())
+
+
+def snapshot_series(snapshot: pd.DataFrame, series: str, label: str, value: str, rates: dict = None,
+                    target: str = None) -> pd.DataFrame:
+    """
+    Returns a labelled series of the snapshot as a DataFrame [label, value],
+    with amounts converted to 'target' and summed over the original currencies.
+    """
+    rows = snapshot[snapshot['SERIES'] == series]
+    values = rows['VALUE'].to_numpy()
+    if series in AMOUNT_SERIES:
+        values = values * conversion_factors(rows['CURRENCY'], rates, target)
+    return pd.Series(values, index=rows['LABEL'].to_numpy()).groupby(level=0).sum().rename_axis(label).rename(value).reset_index()
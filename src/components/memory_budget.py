@@ -0,0 +1,146 @@
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from src.logger_config import logger
+from src.entity.config_entity import MemoryConfig
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Peaks seen so far by the steps being tracked, innermost last. A nested step
+# resets the kernel counter, so it hands its peak back to the enclosing step.
+_active_peaks = []
+
+
+def rss_bytes() -> int:
+    """
+    Returns the current resident set size of this process, or 0 if unknown.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the kernel's peak RSS counter (Linux), so the next peak_rss_bytes()
+    covers only what follows. Returns False where this is not supported, in
+    which case peaks are measured over the whole process lifetime.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes() -> int:
+    """
+    Returns the peak resident set size of this process, or 0 if unknown.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    return 0
+
+
+def format_bytes(size: int) -> str:
+    """
+    Formats a byte count in megabytes for the logs.
+    """
+    return f"{size / 2 ** 20:,.0f} MB"
+
+
+class MemoryBudget:
+    def __init__(self, config: MemoryConfig):
+        """
+        Estimates the in-memory footprint of tables from their files, so stages
+        can choose between loading a table at once, processing it in chunks or
+        spilling to disk, and logs the peak RSS of each step against the budget.
+        """
+        self.config = config
+        self.budget_bytes = int(config.budget_mb * 2 ** 20)
+
+    def csv_footprint(self, path: Path) -> int:
+        """
+        Estimated memory needed to transform a CSV file in one go.
+        """
+        return int(os.path.getsize(path) * self.config.csv_expansion)
+
+    def parquet_footprint(self, path: Path, columns: list = None) -> int:
+        """
+        Estimated memory needed to load a Parquet file, or only some of its
+        columns, from the uncompressed size of its column chunks in the file metadata.
+        """
+        import pyarrow.parquet as pq
+
+        metadata = pq.ParquetFile(path).metadata
+        uncompressed = 0
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            if columns is None:
+                uncompressed += row_group.total_byte_size
+                continue
+            for j in range(row_group.num_columns):
+                chunk = row_group.column(j)
+                if chunk.path_in_schema in columns:
+                    uncompressed += chunk.total_uncompressed_size
+        return int(uncompressed * self.config.parquet_expansion)
+
+    def fits(self, footprint: int) -> bool:
+        """
+        Whether a step with this estimated footprint can run in memory.
+        """
+        return footprint <= self.budget_bytes
+
+    def csv_chunk_rows(self, path: Path) -> int:
+        """
+        Returns 0 if the CSV file fits the budget, otherwise the number of rows
+        per chunk that does, estimated from the mean length of its first lines.
+        """
+        footprint = self.csv_footprint(path)
+        if self.fits(footprint):
+            return 0
+        with open(path, "rb") as f:
+            sample = f.read(1 << 20)
+        bytes_per_row = len(sample) / max(sample.count(b"\n"), 1)
+        return max(int(self.budget_bytes / (bytes_per_row * self.config.csv_expansion)), 1000)
+
+    @contextmanager
+    def track(self, step: str):
+        """
+        Logs the peak RSS of the enclosed step, with a warning if it exceeded
+        the budget. Steps can be nested (e.g. a table within a stage).
+        """
+        if _active_peaks:
+            _active_peaks[-1] = max(_active_peaks[-1], peak_rss_bytes())
+        scoped = reset_peak_rss()
+        _active_peaks.append(0)
+        try:
+            yield
+        finally:
+            peak = max(_active_peaks.pop(), peak_rss_bytes())
+            if _active_peaks:
+                _active_peaks[-1] = max(_active_peaks[-1], peak)
+            message = (
+                f"Memory [{step}]: peak RSS {format_bytes(peak)}{'' if scoped else ' (process lifetime)'}, "
+                f"now {format_bytes(rss_bytes())}, budget {format_bytes(self.budget_bytes)}"
+            )
+            if peak > self.budget_bytes:
+                logger.warning(message)
+            else:
+                logger.info(message)
@@ -0,0 +1,62 @@
+import os
+import pandas as pd
+from pathlib import Path
+from src.logger_config import logger
+from src.entity.config_entity import ParquetStorageConfig
+from src.utils import open_parquet_writer, write_parquet_batch
+from src.components.coordination import check_write_fence
+
+
+class QuarantineWriter:
+    def __init__(self, path: Path, storage: ParquetStorageConfig, columns: list):
+        """
+        Collects the rows a stage rejects for one table into a quarantine
+        Parquet file, each with a reason code, an optional detail (e.g. the
+        failing columns or the raw line) and its row number in the source
+        file. The file is replaced atomically on close, and removed when a run
+        quarantines nothing.
+        """
+        self.path = Path(path)
+        self.storage = storage
+        self.columns = list(columns)
+        self.counts = {}
+        self._tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        self._writer = None
+
+    def add(self, df: pd.DataFrame, reason, detail=None):
+        """
+        Appends rejected rows with a reason code (e.g. 'DUPLICATE_KEY'), either
+        one for all rows or one per row, and an optional detail per row.
+        Values are stored as text, as they were read from the source; columns
+        the rows do not have are left null.
+        """
+        if len(df) == 0:
+            return
+        rows = df.reindex(columns=self.columns).astype(pd.StringDtype("pyarrow"))
+        rows.insert(0, 'SOURCE_ROW', df.index.to_numpy(dtype='int64'))
+        rows.insert(0, 'QUARANTINE_DETAIL', pd.array(
+            [None] * len(df) if detail is None else list(detail), dtype=pd.StringDtype("pyarrow")
+        ))
+        rows.insert(0, 'QUARANTINE_REASON', pd.array(
+            [reason] * len(df) if isinstance(reason, str) else list(reason), dtype=pd.StringDtype("pyarrow")
+        ))
+        if self._writer is None:
+            os.makedirs(self.path.parent, exist_ok=True)
+            self._writer = open_parquet_writer(self._tmp_path, rows, self.storage)
+        write_parquet_batch(self._writer, rows, self.storage)
+        for code, count in rows['QUARANTINE_REASON'].value_counts().items():
+            self.counts[code] = self.counts.get(code, 0) + int(count)
+
+    def close(self):
+        """
+        Publishes the quarantine file and logs the number of rows per reason.
+        """
+        if self._writer is None:
+            if self.path.exists():
+                os.remove(self.path)
+            return
+        self._writer.close()
+        self._writer = None
+        check_write_fence()
+        os.replace(self._tmp_path, self.path)
+        logger.warning(f"Quarantined rows {self.counts} to {self.path}")
@@ -0,0 +1,152 @@
+import os
+import json
+import threading
+import duckdb
+import pyarrow as pa
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.logger_config import logger
+from src.entity.config_entity import SqlServingConfig
+from src.utils import get_current_snapshot
+
+# Only read statements are served; the layer never modifies the presentation data
+READ_ONLY_STATEMENTS = ('select', 'with', 'describe', 'show', 'explain', 'summarize')
+
+
+class SqlServing:
+    def __init__(self, config: SqlServingConfig):
+        """
+        Initializes the embedded SQL engine and registers one view per
+        presentation table. The views read the Parquet files directly, so
+        filters and column selections are pushed down into the Parquet scan
+        and the tables are never loaded into pandas.
+
+        File access is then locked to presentation_path: queries cannot read
+        other files (e.g. with read_csv), attach databases or load extensions,
+        and the lock cannot be lifted while the engine runs.
+        """
+        self.config = config
+        self.connection = duckdb.connect(database=':memory:')
+        self.connection.execute(f"SET threads TO {int(config.threads)}")
+        self._pointer_mtime = None
+        self._refresh_lock = threading.Lock()
+        self._refresh_views()
+
+        allowed_directory = Path(config.presentation_path).resolve().as_posix().replace("'", "''")
+        self.connection.execute(f"SET allowed_directories = ['{allowed_directory}/']")
+        self.connection.execute("SET enable_external_access = false")
+
+    def _refresh_views(self):
+        """
+        Private helper method that re-registers the views when a new presentation
+        snapshot has been published. Only the CURRENT pointer's mtime is checked,
+        so views are rebuilt exactly once per published version.
+        """
+        pointer = Path(self.config.presentation_path) / "CURRENT"
+        try:
+            pointer_mtime = os.stat(pointer).st_mtime_ns
+        except FileNotFoundError:
+            pointer_mtime = 0
+        if pointer_mtime == self._pointer_mtime:
+            return
+        with self._refresh_lock:
+            if pointer_mtime != self._pointer_mtime:
+                self._register_views()
+                self._pointer_mtime = pointer_mtime
+
+    def _register_views(self):
+        """
+        Private helper method to create a view for each configured presentation table
+        of the published snapshot.
+        """
+        try:
+            snapshot_path = get_current_snapshot(self.config.presentation_path)
+        except FileNotFoundError as e:
+            logger.warning(f"{e}; no views registered")
+            return
+        for table_name in self.config.tables:
+            file_path = snapshot_path / f"{table_name}.parquet"
+            if not file_path.exists():
+                logger.warning(f"Presentation table not found, view not registered: {file_path}")
+                continue
+            escaped_path = file_path.resolve().as_posix().replace("'", "''")
+            self.connection.execute(
+                f'CREATE OR REPLACE VIEW "{table_name}" AS SELECT * FROM read_parquet(\'{escaped_path}\')'
+            )
+            logger.info(f"Registered SQL view '{table_name}' over {file_path}")
+
+    def query(self, sql: str) -> pa.Table:
+        """
+        Runs a read-only SQL statement and returns at most max_rows rows as an Arrow table.
+        Each call uses its own cursor, so queries can run concurrently.
+
+        Raises:
+            ValueError: If the statement is not a single read-only statement.
+        """
+        statement = sql.strip().rstrip(';')
+        if not statement.lower().startswith(READ_ONLY_STATEMENTS):
+            raise ValueError(f"Only read-only statements are allowed: {', '.join(READ_ONLY_STATEMENTS)}")
+        # Counted by DuckDB's parser, so a ';' inside a string literal is fine
+        if len(self.connection.extract_statements(statement)) != 1:
+            raise ValueError("Only a single statement can be run per query.")
+
+        self._refresh_views()
+        cursor = self.connection.cursor()
+        try:
+            reader = cursor.execute(statement).fetch_record_batch(self.config.max_rows)
+            batches, rows = [], 0
+            for batch in reader:
+                batches.append(batch)
+                rows += batch.num_rows
+                if rows >= self.config.max_rows:
+                    logger.warning(f"Query result truncated to {self.config.max_rows} rows.")
+                    break
+            return pa.Table.from_batches(batches, schema=reader.schema).slice(0, self.config.max_rows)
+        finally:
+            cursor.close()
+
+    def serve(self):
+        """
+        Starts a small local HTTP endpoint. POST a JSON body {"sql": "..."} to
+        /query to receive {"columns": [...], "rows": [...]}; GET /tables lists
+        the registered views.
+        """
+        serving = self
+
+        class QueryHandler(BaseHTTPRequestHandler):
+            def _send_json(self, status: int, payload: dict):
+                body = json.dumps(payload, default=str).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path != "/tables":
+                    self._send_json(404, {"error": "Not found"})
+                    return
+                tables = serving.query("SELECT view_name FROM duckdb_views() WHERE NOT internal")
+                self._send_json(200, {"tables": tables.column("view_name").to_pylist()})
+
+            def do_POST(self):
+                if self.path != "/query":
+                    self._send_json(404, {"error": "Not found"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    sql = json.loads(self.rfile.read(length) or b"{}").get("sql", "")
+                    result = serving.query(sql)
+                    self._send_json(200, {"columns": result.column_names, "rows": result.to_pylist()})
+                except (ValueError, duckdb.Error) as e:
+                    self._send_json(400, {"error": str(e)})
+
+            def log_message(self, format, *args):
+                logger.info(f"SQL endpoint: {format % args}")
+
+        server = ThreadingHTTPServer((self.config.host, self.config.port), QueryHandler)
+        logger.info(f"SQL endpoint listening on http://{self.config.host}:{self.config.port}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
@@ -0,0 +1,163 @@
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# Description columns indexed for products and, prefixed with CATEGORY_, for their categories
+TEXT_FIELDS = ['SHORT_DESCR', 'MEDIUM_DESCR', 'LONG_DESCR']
+
+# Length of the character n-grams used for fuzzy matching
+NGRAM_SIZE = 3
+
+# Least Jaccard similarity of n-grams for a fuzzy match (e.g. 'moutain' vs 'mountain' is 0.5)
+MIN_SIMILARITY = 0.4
+
+
+def normalize_text(texts: pd.Series) -> pd.Series:
+    """
+    Case-folds texts and strips accents, so 'Fahrräder' and 'FAHRRADER' match.
+    Texts are handled as Python strings, so the regular expressions are
+    Unicode-aware for every language.
+    """
+    return (
+        texts.astype(object)
+        .str.normalize('NFKD').str.replace(r'[\u0300-\u036f]', '', regex=True).str.casefold()
+    )
+
+
+def tokenize(texts: pd.Series) -> pd.Series:
+    """
+    Splits normalised texts into word tokens, one row per token with the
+    index of its text. Empty texts produce no rows.
+    """
+    tokens = normalize_text(texts.dropna()).str.findall(r'\w+').explode()
+    return tokens.dropna().astype(pd.StringDtype("pyarrow"))
+
+
+def query_tokens(query: str) -> list:
+    """
+    Tokenizes a search query exactly like tokenize(), without the overhead of a Series.
+    """
+    text = re.sub(r'[\u0300-\u036f]', '', unicodedata.normalize('NFKD', query)).casefold()
+    return re.findall(r'\w+', text)
+
+
+def term_ngrams(term: str) -> list:
+    """
+    Returns the distinct character n-grams of a term padded with '^' and '$',
+    so short terms and word boundaries get n-grams too.
+    """
+    padded = f"^{term}$"
+    return sorted({padded[i:i + NGRAM_SIZE] for i in range(max(len(padded) - NGRAM_SIZE + 1, 1))})
+
+
+def build_text_index(product_texts: pd.DataFrame, category_texts: pd.DataFrame, products: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds an inverted index over the product and category descriptions in
+    every language. A category's terms are posted for each of its products,
+    and product ids are indexed without a language.
+
+    Returns:
+        pd.DataFrame: One row per distinct TERM, PRODUCTID, LANGUAGE and FIELD,
+        sorted by TERM so that prefix lookups are a range of rows.
+    """
+    category_texts = products[['PRODUCTID', 'PRODCATEGORYID']].merge(category_texts, on='PRODCATEGORYID', how='inner')
+    sources = [
+        (product_texts, '', TEXT_FIELDS),
+        (category_texts, 'CATEGORY_', TEXT_FIELDS),
+        (products.assign(LANGUAGE=None), '', ['PRODUCTID'])
+    ]
+
+    postings = []
+    for texts, prefix, fields in sources:
+        for field in fields:
+            if field not in texts.columns:
+                continue
+            tokens = tokenize(texts[field])
+            postings.append(pd.DataFrame({
+                'TERM': tokens.to_numpy(),
+                'PRODUCTID': texts.loc[tokens.index, 'PRODUCTID'].to_numpy(),
+                'LANGUAGE': texts.loc[tokens.index, 'LANGUAGE'].to_numpy(),
+                'FIELD': f'{prefix}{field}'
+            }))
+
+    index = pd.concat(postings, ignore_index=True).astype(pd.StringDtype("pyarrow"))
+    return index.drop_duplicates().sort_values(['TERM', 'PRODUCTID', 'FIELD', 'LANGUAGE'], kind='stable').reset_index(drop=True)
+
+
+def build_ngram_index(text_index: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds the n-gram table of the index vocabulary: one row per GRAM and
+    TERM, sorted by GRAM, with the term's number of n-grams for similarity scoring.
+    """
+    terms = text_index['TERM'].unique()
+    grams = [term_ngrams(term) for term in terms]
+    ngrams = pd.DataFrame({
+        'GRAM': np.concatenate(grams) if grams else np.array([], dtype=object),
+        'TERM': np.repeat(terms, [len(g) for g in grams]),
+        'TERM_NGRAMS': np.repeat([len(g) for g in grams], [len(g) for g in grams]).astype('int16')
+    })
+    ngrams = ngrams.astype({'GRAM': pd.StringDtype("pyarrow"), 'TERM': pd.StringDtype("pyarrow")})
+    return ngrams.sort_values(['GRAM', 'TERM'], kind='stable').reset_index(drop=True)
+
+
+class TextIndex:
+    def __init__(self, text_index: pd.DataFrame, text_ngrams: pd.DataFrame):
+        """
+        Answers prefix and fuzzy product searches from the text_index and
+        text_ngrams tables. Both are sorted, so a lookup is a binary search
+        into their columns rather than a scan of the descriptions.
+        """
+        self.postings = text_index
+        self.ngrams = text_ngrams
+        self._terms = text_index['TERM'].to_numpy(dtype=object)
+        self._grams = text_ngrams['GRAM'].to_numpy(dtype=object)
+
+    def _fuzzy_matches(self, token: str, min_similarity: float) -> pd.Series:
+        """
+        Returns the indexed terms whose n-grams overlap the token's with a
+        Jaccard similarity of at least 'min_similarity', and their similarity.
+        """
+        grams = term_ngrams(token)
+        starts = np.searchsorted(self._grams, grams, side='left')
+        ends = np.searchsorted(self._grams, grams, side='right')
+        rows = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+        candidates = self.ngrams.iloc[rows]
+        shared = candidates.groupby('TERM', observed=True).agg(SHARED=('GRAM', 'size'), TERM_NGRAMS=('TERM_NGRAMS', 'first'))
+        similarity = shared['SHARED'] / (len(grams) + shared['TERM_NGRAMS'] - shared['SHARED'])
+        return similarity[similarity >= min_similarity]
+
+    def search(self, query: str, fuzzy: bool = False, languages: list = None,
+               min_similarity: float = MIN_SIMILARITY) -> pd.DataFrame:
+        """
+        Finds the products matching every word of the query. Each word matches
+        the terms it is a prefix of and, with 'fuzzy', terms with similar
+        n-grams (typos). A product's SCORE is the mean over the query words of
+        its best match similarity, so exact and prefix matches rank first.
+        Language-neutral terms (product ids) match whatever the languages.
+
+        Returns:
+            pd.DataFrame: PRODUCTID and SCORE, best matches first.
+        """
+        tokens = query_tokens(query)
+        if not tokens:
+            return pd.DataFrame({'PRODUCTID': pd.Series(dtype=pd.StringDtype("pyarrow")), 'SCORE': pd.Series(dtype='float64')})
+
+        scores = None
+        for token in tokens:
+            # Postings are sorted by term, so the terms starting with the token are one range of rows
+            start, end = np.searchsorted(self._terms, [token, token + '\uffff'])
+            hits = self.postings.iloc[start:end].assign(SIMILARITY=1.0)
+            if fuzzy:
+                similar = self._fuzzy_matches(token, min_similarity)
+                fuzzy_hits = self.postings[self.postings['TERM'].isin(similar.index)]
+                hits = pd.concat([hits, fuzzy_hits.assign(SIMILARITY=fuzzy_hits['TERM'].map(similar).to_numpy())])
+            if languages:
+                hits = hits[hits['LANGUAGE'].isin(languages) | hits['LANGUAGE'].isna()]
+            best = hits.groupby(hits['PRODUCTID'].to_numpy())['SIMILARITY'].max()
+            if scores is not None:
+                common = scores.index.intersection(best.index)
+                best = scores[common] + best[common]
+            scores = best
+        scores = (scores / len(tokens)).rename('SCORE').rename_axis('PRODUCTID').reset_index()
+        return scores.sort_values(['SCORE', 'PRODUCTID'], ascending=[False, True], kind='stable').reset_index(drop=True)
@@ -1,5 +1,5 @@
 from src.utils import read_yaml, create_directories
-from src.entity.config_entity import DataIngestionConfig, DataValidationConfig, DataTransformationConfig, DataModellingConfig
+from src.entity.config_entity import DataIngestionConfig, DataValidationConfig, DataTransformationConfig, DataModellingConfig, ParquetStorageConfig, SqlServingConfig, CoordinationConfig, MemoryConfig
 from pathlib import Path
 
 class ConfigurationManager:
@@ -56,12 +56,18 @@ class ConfigurationManager:
         Extracts the data transformation configuration from the main config file.
         """
         config = self.config.data_transformation
-        create_directories([Path(config.root_dir), Path(config.output_path)])
+        create_directories([Path(config.root_dir), Path(config.output_path), Path(config.quarantine_path)])
 
         data_transformation_config = DataTransformationConfig(
             root_dir=Path(config.root_dir),
             data_path=Path(config.data_path),
-            output_path=Path(config.output_path)
+            output_path=Path(config.output_path),
+            storage=self.get_parquet_storage_config(),
+            quarantine_path=Path(config.quarantine_path),
+            chunk_rows=int(config.chunk_rows),
+            key_store_path=Path(config.key_store_path),
+            bad_rows=config.get('bad_rows', 'quarantine'),
+            memory=self.get_memory_config()
         )
         return data_transformation_config
 
@@ -70,11 +76,84 @@ class ConfigurationManager:
         Extracts the data modelling configuration from the main config file.
         """
         config = self.config.data_modelling
-        create_directories([Path(config.root_dir), Path(config.presentation_path)])
+        create_directories([Path(config.root_dir), Path(config.presentation_path), Path(config.spill_dir)])
 
         data_modelling_config = DataModellingConfig(
             root_dir=Path(config.root_dir),
             processed_data_path=Path(config.processed_data_path),
-            presentation_path=Path(config.presentation_path)
+            presentation_path=Path(config.presentation_path),
+            storage=self.get_parquet_storage_config(),
+            join_engine=config.join_engine,
+            join_spill=config.get('join_spill', 'auto'),
+            join_partitions=config.join_partitions,
+            spill_dir=Path(config.spill_dir),
+            modelling_mode=config.modelling_mode,
+            batch_rows=config.batch_rows,
+            snapshot_retention=config.snapshot_retention,
+            geo_index_precision=config.get('geo_index_precision', 6),
+            memory=self.get_memory_config()
         )
-        return data_modelling_config
\ No newline at end of file
+        return data_modelling_config
+
+    def get_sql_serving_config(self) -> SqlServingConfig:
+        """
+        Extracts the SQL serving layer configuration from the main config file.
+        """
+        config = self.config.sql_serving
+
+        sql_serving_config = SqlServingConfig(
+            presentation_path=Path(config.presentation_path),
+            tables=list(config.tables),
+            host=config.host,
+            port=config.port,
+            max_rows=config.max_rows,
+            threads=config.threads
+        )
+        return sql_serving_config
+
+    def get_coordination_config(self) -> CoordinationConfig:
+        """
+        Extracts the pipeline lock and work queue configuration from the main config file.
+        """
+        config = self.config.coordination
+
+        coordination_config = CoordinationConfig(
+            database=Path(config.database),
+            lease_seconds=config.lease_seconds,
+            max_attempts=config.max_attempts,
+            poll_seconds=config.poll_seconds,
+            worker_idle_exit_seconds=config.worker_idle_exit_seconds
+        )
+        return coordination_config
+
+    def get_memory_config(self) -> MemoryConfig:
+        """
+        Extracts the memory budget that stages plan their execution strategy against.
+        """
+        config = self.config.get('memory', {})
+
+        memory_config = MemoryConfig(
+            budget_mb=config.get('budget_mb', 6144),
+            csv_expansion=config.get('csv_expansion', 4.0),
+            parquet_expansion=config.get('parquet_expansion', 3.0)
+        )
+        return memory_config
+
+    def get_parquet_storage_config(self) -> ParquetStorageConfig:
+        """
+        Extracts the Parquet storage policy (compression, row groups, sorting,
+        dictionary encoding and bloom filters) shared by all Parquet writers.
+        """
+        config = self.config.get('parquet_storage', {})
+
+        parquet_storage_config = ParquetStorageConfig(
+            compression=config.get('compression', 'zstd'),
+            compression_level=config.get('compression_level', 3),
+            row_group_size=config.get('row_group_size', 131072),
+            dictionary_max_cardinality=config.get('dictionary_max_cardinality', 0.5),
+            write_statistics=config.get('write_statistics', True),
+            sort_by=dict(config.get('sort_by') or {}),
+            bloom_filter_columns=list(config.get('bloom_filter_columns') or []),
+            bloom_filter_fpp=config.get('bloom_filter_fpp', 0.05)
+        )
+        return parquet_storage_config
\ No newline at end of file
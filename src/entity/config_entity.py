@@ -1,6 +1,29 @@
 from dataclasses import dataclass
 from pathlib import Path
 
+# --- Parquet Storage Configuration Entity ---
+# This defines the storage policy shared by every Parquet writer in the pipeline.
+@dataclass(frozen=True)
+class ParquetStorageConfig:
+    compression: str
+    compression_level: int
+    row_group_size: int
+    dictionary_max_cardinality: float
+    write_statistics: bool
+    sort_by: dict
+    bloom_filter_columns: list
+    bloom_filter_fpp: float
+
+
+# --- Memory Configuration Entity ---
+# This defines the memory budget that stages plan their execution strategy against.
+@dataclass(frozen=True)
+class MemoryConfig:
+    budget_mb: float
+    csv_expansion: float
+    parquet_expansion: float
+
+
 # --- Data Ingestion Configuration Entity ---
 # This defines the structure for the data ingestion configuration.
 @dataclass(frozen=True)
@@ -26,6 +49,12 @@ class DataTransformationConfig:
     root_dir: Path
     data_path: Path
     output_path: Path
+    storage: ParquetStorageConfig
+    quarantine_path: Path
+    chunk_rows: int
+    key_store_path: Path
+    bad_rows: str
+    memory: MemoryConfig
 
 # --- Data Modelling Configuration Entity ---
 # This defines the structure for the data modelling configuration.
@@ -33,4 +62,35 @@ class DataTransformationConfig:
 class DataModellingConfig:
     root_dir: Path
     processed_data_path: Path
-    presentation_path: Path
\ No newline at end of file
+    presentation_path: Path
+    storage: ParquetStorageConfig
+    join_engine: str
+    join_spill: str
+    join_partitions: int
+    spill_dir: Path
+    modelling_mode: str
+    batch_rows: int
+    snapshot_retention: int
+    geo_index_precision: int
+    memory: MemoryConfig
+
+# --- SQL Serving Configuration Entity ---
+# This defines the structure for the embedded SQL serving layer configuration.
+@dataclass(frozen=True)
+class SqlServingConfig:
+    presentation_path: Path
+    tables: list
+    host: str
+    port: int
+    max_rows: int
+    threads: int
+
+# --- Coordination Configuration Entity ---
+# This defines the structure for the pipeline lock and work queue configuration.
+@dataclass(frozen=True)
+class CoordinationConfig:
+    database: Path
+    lease_seconds: int
+    max_attempts: int
+    poll_seconds: float
+    worker_idle_exit_seconds: int
@@ -11,16 +11,29 @@ logging_str = "[%(asctime)s: %(levelname)s: %(module)s: %(message)s]"
 # Define the log directory and file path
 log_dir = "logs"
 log_filepath = os.path.join(log_dir, "running_logs.log")
-os.makedirs(log_dir, exist_ok=True)
+
+
+class LazyFileHandler(logging.FileHandler):
+    """
+    A FileHandler that creates the log directory and opens the file on the
+    first emitted record instead of at import time.
+    """
+    def __init__(self, filename: str):
+        super().__init__(filename, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
 
 # Configure the logger to have two handlers:
-# 1. FileHandler: Saves logs to the running_logs.log file.
+# 1. LazyFileHandler: Saves logs to the running_logs.log file.
 # 2. StreamHandler: Displays logs in the terminal during execution.
 logging.basicConfig(
     level=logging.INFO,
     format=logging_str,
     handlers=[
-        logging.FileHandler(log_filepath),
+        LazyFileHandler(log_filepath),
         logging.StreamHandler(sys.stdout)
     ]
 )
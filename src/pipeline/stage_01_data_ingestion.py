@@ -1,5 +1,4 @@
 from src.config.configuration import ConfigurationManager
-from src.components.data_ingestion import DataIngestion
 from src.logger_config import logger
 
 STAGE_NAME = "Data Ingestion Stage"
@@ -19,6 +18,9 @@ class DataIngestionPipeline:
         """
         try:
             logger.info(f">>>>>> Stage '{STAGE_NAME}' started <<<<<<")
+
+            # The component (and its heavy dependencies) is only imported when the stage runs
+            from src.components.data_ingestion import DataIngestion
             
             # Initialize the configuration manager
             config = ConfigurationManager()
@@ -1,5 +1,4 @@
 from src.config.configuration import ConfigurationManager
-from src.components.data_validation import DataValidation
 from src.logger_config import logger
 
 STAGE_NAME = "Data Validation Stage"
@@ -17,6 +16,9 @@ class DataValidationPipeline:
         """
         try:
             logger.info(f">>>>>> Stage '{STAGE_NAME}' started <<<<<<")
+
+            # The component (and its heavy dependencies) is only imported when the stage runs
+            from src.components.data_validation import DataValidation
             
             # Initialize the configuration manager
             config = ConfigurationManager()
@@ -0,0 +1,133 @@
+import time
+import uuid
+from datetime import datetime, timezone
+from src.config.configuration import ConfigurationManager
+from src.components.coordination import CoordinationStore, TaskQueue, Heartbeat, new_owner_id, check_write_fence
+from src.logger_config import logger
+
+STAGE_NAME = "Work Queue"
+
+class WorkQueuePipeline:
+    def __init__(self):
+        """
+        This pipeline distributes the transformation and modelling stages over
+        any number of worker processes on this host, coordinated through the
+        SQLite database (which must be on a local disk).
+        The process that starts a stage enqueues its tasks and works on them too;
+        other processes join with work().
+        """
+        self.config = ConfigurationManager()
+        self.coordination_config = self.config.get_coordination_config()
+        self.queue = TaskQueue(CoordinationStore(self.coordination_config))
+        self.owner = new_owner_id()
+
+    def run_transformation(self):
+        """
+        Transforms every raw CSV file as a separate task.
+        """
+        from src.components.data_transformation import DataTransformation
+
+        data_transformation = DataTransformation(config=self.config.get_data_transformation_config())
+        tasks = {csv_file: {"csv_file": csv_file} for csv_file in data_transformation.list_csv_files()}
+        self._run_stage("transformation", tasks)
+
+    def run_modelling(self):
+        """
+        Builds every presentation table as a separate task into one unpublished
+        snapshot, and publishes the snapshot only when all tasks have succeeded.
+        """
+        from src.components.data_modelling import DataModelling
+
+        data_modelling = DataModelling(config=self.config.get_data_modelling_config())
+        version = data_modelling.new_snapshot()
+        tasks = {table: {"table": table, "version": version} for table in data_modelling.PRESENTATION_TABLES}
+        try:
+            self._run_stage("modelling", tasks)
+        except Exception:
+            data_modelling.discard_snapshot(version)
+            raise
+        data_modelling.publish_snapshot(version)
+
+    def work(self, run_id: str = None, stop_when_idle: bool = True) -> int:
+        """
+        Claims and executes tasks until none are left. Without a run_id the
+        worker serves every run; it exits after worker_idle_exit_seconds without work.
+
+        Returns:
+            int: The number of tasks executed by this process.
+        """
+        executed = 0
+        idle_since = time.monotonic()
+        while True:
+            # A run that lost the pipeline lease stops taking on work
+            check_write_fence()
+            task = self.queue.claim(self.owner, run_id=run_id)
+            if task is None:
+                if stop_when_idle or time.monotonic() - idle_since > self.coordination_config.worker_idle_exit_seconds:
+                    return executed
+                time.sleep(self.coordination_config.poll_seconds)
+                continue
+
+            self._execute(*task)
+            executed += 1
+            idle_since = time.monotonic()
+
+    def _run_stage(self, stage: str, tasks: dict):
+        """
+        Private helper method that enqueues a stage's tasks, works on them and
+        waits for the tasks claimed by other workers.
+
+        Raises:
+            RuntimeError: If any task failed on all its attempts.
+        """
+        run_id = f"{stage}-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        logger.info(f">>>>>> {STAGE_NAME} run '{run_id}' started with {len(tasks)} tasks <<<<<<")
+
+        # The run's tasks are only claimable while this process holds the run lease
+        with self.queue.run_lease(run_id, self.owner):
+            self.queue.enqueue(run_id, stage, tasks)
+            while True:
+                self.work(run_id=run_id)
+                progress = self.queue.progress(run_id)
+                if not progress.get('pending') and not progress.get('running'):
+                    break
+                # Other workers hold the remaining tasks; expired ones are reclaimed by work()
+                time.sleep(self.coordination_config.poll_seconds)
+
+        failures = self.queue.failures(run_id)
+        if failures:
+            raise RuntimeError(f"{STAGE_NAME} run '{run_id}' failed tasks: {failures}")
+        logger.info(f">>>>>> {STAGE_NAME} run '{run_id}' completed: {progress} <<<<<<")
+
+    def _execute(self, run_id: str, task_id: str, stage: str, payload: dict):
+        """
+        Private helper method that runs one task while renewing its lease.
+        Failures are recorded for retry instead of stopping the worker. A file
+        that fails schema validation is skipped, as in a single-process run.
+        """
+        heartbeat = Heartbeat(
+            self.coordination_config.lease_seconds / 3,
+            lambda: self.queue.renew(run_id, task_id, self.owner)
+        )
+        heartbeat.start()
+        try:
+            logger.info(f"Running task '{task_id}' of run '{run_id}'")
+            if stage == "transformation":
+                from src.components.data_transformation import DataTransformation
+                data_transformation = DataTransformation(config=self.config.get_data_transformation_config())
+                if not data_transformation.transform_file(payload["csv_file"]):
+                    logger.error(f"Skipped {payload['csv_file']}: it failed schema validation")
+                    self.queue.skip(run_id, task_id, self.owner, "failed schema validation")
+                    return
+            elif stage == "modelling":
+                from src.components.data_modelling import DataModelling
+                data_modelling = DataModelling(config=self.config.get_data_modelling_config())
+                data_modelling.build_table(payload["table"], payload["version"])
+            else:
+                raise ValueError(f"Unknown stage: {stage}")
+            self.queue.complete(run_id, task_id, self.owner)
+        except Exception as e:
+            logger.exception(f"Task '{task_id}' of run '{run_id}' failed: {e}")
+            self.queue.fail(run_id, task_id, self.owner, str(e))
+        finally:
+            heartbeat.stop()
@@ -1,19 +1,31 @@
+from __future__ import annotations
+
 import os
 import yaml
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, List
 from box import ConfigBox
 from box.exceptions import BoxValueError
-from ensure import ensure_annotations
 from src.logger_config import logger # CORRECTED: Importing from our logging module
+from src.entity.config_entity import ParquetStorageConfig
+from src.components.coordination import check_write_fence
+
+# pandas and pyarrow are imported inside the Parquet helpers so that importing
+# this module (and the configuration stack) stays fast
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
 
 # --- File Operations ---
 
-@ensure_annotations
 def read_yaml(path_to_yaml: Path) -> ConfigBox:
     """
-    Reads a YAML file and returns its content as a ConfigBox object.
+    Reads a YAML file and returns its content as a frozen ConfigBox object.
     ConfigBox allows accessing dictionary keys using dot notation (e.g., config.key).
+    The parsed file is cached per path and modification time, so every stage
+    shares one immutable object until the file changes.
 
     Args:
         path_to_yaml (Path): Path to the YAML file.
@@ -23,7 +35,20 @@ def read_yaml(path_to_yaml: Path) -> ConfigBox:
         Exception: For other file reading errors.
 
     Returns:
-        ConfigBox: A ConfigBox object containing the file's content.
+        ConfigBox: A frozen ConfigBox object containing the file's content.
+    """
+    try:
+        modified_at = os.stat(path_to_yaml).st_mtime_ns
+    except OSError as e:
+        logger.error(f"Error reading YAML file {path_to_yaml}: {e}")
+        raise e
+    return _read_yaml_cached(str(Path(path_to_yaml).resolve()), modified_at)
+
+
+@lru_cache(maxsize=None)
+def _read_yaml_cached(path_to_yaml: str, modified_at: int) -> ConfigBox:
+    """
+    Parses a YAML file once per (path, modification time). See read_yaml.
     """
     try:
         with open(path_to_yaml) as yaml_file:
@@ -31,7 +56,7 @@ def read_yaml(path_to_yaml: Path) -> ConfigBox:
             if not content:
                 raise ValueError("YAML file is empty.")
             logger.info(f"YAML file loaded successfully: {path_to_yaml}")
-            return ConfigBox(content)
+            return ConfigBox(content, frozen_box=True)
     except BoxValueError:
         raise ValueError("YAML file syntax error.")
     except Exception as e:
@@ -39,7 +64,6 @@ def read_yaml(path_to_yaml: Path) -> ConfigBox:
         raise e
 
 
-@ensure_annotations
 def create_directories(path_to_directories: list, verbose: bool = True):
     """
     Creates a list of directories.
@@ -54,7 +78,27 @@ def create_directories(path_to_directories: list, verbose: bool = True):
             logger.info(f"Directory created or already exists: {path}")
 
 
-@ensure_annotations
+def get_current_snapshot(presentation_path: Path) -> Path:
+    """
+    Resolves the published presentation snapshot directory.
+
+    Args:
+        presentation_path (Path): The presentation root holding the CURRENT pointer.
+
+    Returns:
+        Path: presentation_path/versions/<version> named by CURRENT.
+
+    Raises:
+        FileNotFoundError: If no snapshot has been published yet.
+    """
+    pointer = Path(presentation_path) / "CURRENT"
+    try:
+        version = pointer.read_text().strip()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No presentation snapshot has been published to {presentation_path}; run the modelling stage first")
+    return Path(presentation_path) / "versions" / version
+
+
 def get_size(path: Path) -> str:
     """
     Gets the size of a file and returns it as a formatted string in KB.
@@ -67,3 +111,121 @@ def get_size(path: Path) -> str:
     """
     size_in_kb = round(os.path.getsize(path) / 1024)
     return f"~ {size_in_kb} KB"
+
+
+
+# --- Parquet Storage ---
+
+def save_parquet(df: pd.DataFrame, path: Path, storage: ParquetStorageConfig, table_name: str):
+    """
+    Writes a DataFrame to Parquet following the configured storage policy.
+    The file is replaced atomically.
+    Rows are sorted by the table's configured key/date columns so that the
+    row-group min/max statistics stay selective, low-cardinality string columns
+    are dictionary-encoded and bloom filters are added for the configured ID columns.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to write.
+        path (Path): Destination Parquet file.
+        storage (ParquetStorageConfig): The storage policy from config.yaml.
+        table_name (str): Table name used to look up the sort order.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sort_by = [col for col in storage.sort_by.get(table_name, []) if col in df.columns]
+    if sort_by:
+        df = df.sort_values(sort_by, kind='stable', na_position='last')
+
+    # The pandas index is never meaningful in this pipeline, so it is not stored
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    write_options = _parquet_write_options(table, storage)
+    if sort_by:
+        write_options['sorting_columns'] = pq.SortingColumn.from_ordering(
+            table.schema, [(col, 'ascending') for col in sort_by]
+        )
+
+    # Written to a temporary file and swapped in, so readers never see a partial file
+    tmp_path = Path(path).with_name(f"{Path(path).name}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path, row_group_size=storage.row_group_size, **write_options)
+    check_write_fence()
+    os.replace(tmp_path, path)
+    logger.info(f"Saved {table_name} ({table.num_rows} rows, {get_size(path)}) to {path}")
+
+
+def open_parquet_writer(path: Path, df: pd.DataFrame, storage: ParquetStorageConfig) -> pq.ParquetWriter:
+    """
+    Opens a Parquet writer for tables that are written batch by batch.
+    The schema, dictionary columns and bloom filters are derived from the first
+    batch. Rows are written in arrival order, so no sort order is recorded.
+
+    Args:
+        path (Path): Destination Parquet file.
+        df (pd.DataFrame): The first batch to be written.
+        storage (ParquetStorageConfig): The storage policy from config.yaml.
+
+    Returns:
+        pq.ParquetWriter: An open writer; use write_parquet_batch and close it when done.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return pq.ParquetWriter(path, table.schema, **_parquet_write_options(table, storage))
+
+
+def write_parquet_batch(writer: pq.ParquetWriter, df: pd.DataFrame, storage: ParquetStorageConfig):
+    """
+    Appends a batch to a writer opened with open_parquet_writer, cast to the writer's schema.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False)
+    writer.write_table(table, row_group_size=storage.row_group_size)
+
+
+@lru_cache(maxsize=None)
+def _supports_bloom_filters() -> bool:
+    """
+    Checks whether the installed pyarrow can write Parquet bloom filters.
+    Older versions reject the option, so the files are written without them.
+    """
+    import inspect
+    import pyarrow
+    import pyarrow.parquet as pq
+
+    if 'bloom_filter_options' in inspect.signature(pq.ParquetWriter.__init__).parameters:
+        return True
+    logger.warning(f"pyarrow {pyarrow.__version__} cannot write Parquet bloom filters; they are skipped")
+    return False
+
+
+def _parquet_write_options(table: pa.Table, storage: ParquetStorageConfig) -> dict:
+    """
+    Builds the pyarrow writer options (codec, dictionary encoding, statistics
+    and bloom filters) for a table under the storage policy.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # Dictionary-encode only the string columns with few distinct values
+    dictionary_columns = []
+    for field in table.schema:
+        if (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)) and table.num_rows > 0:
+            distinct_ratio = pc.count_distinct(table[field.name]).as_py() / table.num_rows
+            if distinct_ratio <= storage.dictionary_max_cardinality:
+                dictionary_columns.append(field.name)
+
+    write_options = {
+        'compression': storage.compression,
+        'compression_level': storage.compression_level,
+        'use_dictionary': dictionary_columns,
+        'write_statistics': storage.write_statistics
+    }
+    bloom_columns = [col for col in storage.bloom_filter_columns if col in table.column_names]
+    if bloom_columns and _supports_bloom_filters():
+        write_options['bloom_filter_options'] = {
+            col: {'ndv': max(table.num_rows, 1), 'fpp': storage.bloom_filter_fpp} for col in bloom_columns
+        }
+    return write_options
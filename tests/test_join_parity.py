@@ -0,0 +1,103 @@
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import yaml
+
+# --- JOIN ENGINE PARITY ---
+# Builds the presentation tables from the bundled dataset with each join
+# engine and join path, and checks that they are identical to the in-memory
+# hash join. The out-of-core variants scan SalesOrderItems in small batches,
+# joined against SalesOrders in memory or through hash partitions on disk.
+# The upstream stages run once and are shared.
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+UPSTREAM_STAGES = ["ingestion", "validation", "transformation"]
+
+BASELINE = {"join_engine": "hash", "modelling_mode": "in_memory"}
+VARIANTS = {
+    "pandas": {"join_engine": "pandas", "modelling_mode": "in_memory"},
+    "streamed": {"join_engine": "hash", "modelling_mode": "out_of_core", "join_spill": "never", "batch_rows": 500},
+    "spilled": {"join_engine": "hash", "modelling_mode": "out_of_core", "join_spill": "always", "batch_rows": 500},
+    "spilled_pandas": {"join_engine": "pandas", "modelling_mode": "out_of_core", "join_spill": "always", "batch_rows": 500}
+}
+
+
+def run_pipeline(workspace: Path, stages: list):
+    """
+    Runs pipeline stages in a fresh interpreter with the workspace as working directory.
+    """
+    process = subprocess.run(
+        [sys.executable, str(PROJECT_ROOT / "main.py"), "--stages", *stages],
+        cwd=workspace, capture_output=True, text=True
+    )
+    assert process.returncode == 0, f"Stages {stages} failed:\n{process.stdout[-3000:]}{process.stderr[-3000:]}"
+
+
+def canonical(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns a table in a form that does not depend on row or column order:
+    columns by name, categoricals as plain values, rows sorted by every column.
+    """
+    df = df[sorted(df.columns)].copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(df[col].cat.categories.dtype)
+    floats = [col for col in df.columns if pd.api.types.is_float_dtype(df[col])]
+    others = [col for col in df.columns if col not in floats]
+    keys = pd.DataFrame({col: df[col].astype("string") for col in others}, index=df.index).join(df[floats])
+    order = keys.sort_values(others + floats, na_position="last", kind="stable").index
+    return df.loc[order].reset_index(drop=True)
+
+
+def build_presentation(processed: Path, name: str, settings: dict) -> dict:
+    """
+    Runs the modelling stage on a copy of the processed workspace with the
+    given data_modelling settings and returns its presentation tables in canonical form.
+    """
+    workspace = processed.with_name(name)
+    shutil.copytree(processed, workspace)
+    config = yaml.safe_load((workspace / "config.yaml").read_text())
+    config["data_modelling"].update(settings)
+    (workspace / "config.yaml").write_text(yaml.safe_dump(config, sort_keys=False))
+
+    run_pipeline(workspace, ["modelling"])
+    presentation = workspace / config["data_modelling"]["presentation_path"]
+    snapshot = presentation / "versions" / (presentation / "CURRENT").read_text().strip()
+    return {path.stem: canonical(pd.read_parquet(path)) for path in sorted(snapshot.glob("*.parquet"))}
+
+
+@pytest.fixture(scope="module")
+def processed_workspace(tmp_path_factory) -> Path:
+    """
+    A workspace with the bundled dataset ingested, validated and transformed.
+    """
+    workspace = tmp_path_factory.mktemp("join_parity") / "processed"
+    workspace.mkdir()
+    shutil.copy(PROJECT_ROOT / "schema.yaml", workspace / "schema.yaml")
+    config = yaml.safe_load((PROJECT_ROOT / "config.yaml").read_text())
+    config["data_ingestion"]["source_zip_file"] = str(PROJECT_ROOT / "BI Test.zip")
+    (workspace / "config.yaml").write_text(yaml.safe_dump(config, sort_keys=False))
+    run_pipeline(workspace, UPSTREAM_STAGES)
+    return workspace
+
+
+@pytest.fixture(scope="module")
+def baseline(processed_workspace) -> dict:
+    tables = build_presentation(processed_workspace, "baseline", BASELINE)
+    assert tables, "no presentation tables were published"
+    return tables
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_join_paths_build_identical_tables(processed_workspace, baseline, variant):
+    tables = build_presentation(processed_workspace, variant, VARIANTS[variant])
+
+    assert sorted(tables) == sorted(baseline)
+    for name, expected in baseline.items():
+        pd.testing.assert_frame_equal(
+            expected, tables[name], check_dtype=False, check_exact=False, rtol=1e-9, atol=1e-9,
+            obj=f"{name} built with {variant}"
+        )